@@ -0,0 +1,87 @@
+from __future__ import annotations
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Tuple
+
+from fastapi import HTTPException
+
+from core.metrics import metrics, record_stage
+
+
+class SingleFlight:
+    # 같은 key로 진행 중인 계산이 있으면 새로 시작하지 않고 그 결과를 같이 기다림
+    # 계산은 별도 task로 돌려서, 먼저 온 요청의 클라이언트가 끊겨도 기다리는 쪽은 결과를 받음
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        # 반환: (결과, 다른 요청의 계산을 공유했는지)
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), shared
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 기다리던 요청이 모두 끊겼어도 "exception was never retrieved" 경고가 나지 않도록
+        if not task.cancelled():
+            task.exception()
+
+
+class Limiter:
+    # 단계별 동시 실행 수 제한 + 대기열 길이 기반 부하 차단
+    # - concurrency개까지 동시에 실행, 나머지는 대기
+    # - 대기 중인 요청이 max_queue개 이상이면 기다리지 않고 바로 429 (Retry-After)
+    # - concurrency <= 0 이면 제한 없음
+    def __init__(self, name: str, concurrency: int, max_queue: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max(0, max_queue)
+        self.waiting = 0
+        self.active = 0
+        self._sem = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+
+    def check(self) -> None:
+        # 지금 slot()을 부르면 거절될 상황이면 미리 429 (스트리밍 응답을 시작하기 전에 확인용)
+        if self._sem is not None and self._sem.locked() and self.waiting >= self.max_queue:
+            metrics.inc("admission_rejected_total", stage=self.name)
+            raise HTTPException(
+                429,
+                f"요청이 많아 지금은 처리할 수 없습니다. 잠시 후 다시 시도하세요. (stage={self.name}, waiting={self.waiting})",
+                headers={"Retry-After": "1"},
+            )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._sem is None:
+            yield
+            return
+        self.check()
+        if self._sem.locked():
+            # 기다린 시간은 stage_seconds{stage="<name>_wait"} 와 Server-Timing 으로
+            self.waiting += 1
+            t0 = time.perf_counter()
+            try:
+                await self._sem.acquire()
+            finally:
+                self.waiting -= 1
+            record_stage(f"{self.name}_wait", time.perf_counter() - t0)
+        else:
+            await self._sem.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+
+    def info(self) -> Dict[str, int]:
+        return {"concurrency": self.concurrency, "max_queue": self.max_queue, "active": self.active, "waiting": self.waiting}
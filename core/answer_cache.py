@@ -0,0 +1,82 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from core.embed_cache import normalize_text
+
+
+@dataclass
+class _Entry:
+    vec: Optional[np.ndarray]
+    text: str
+    doc_ids: frozenset
+    value: Any
+    created_at: float
+
+
+# 질문 임베딩이 코사인 거리 max_distance 이내이고 top-k 문서 집합이 같으면 이전 답변 재사용
+# 임베딩 없이 답한 경우(lexical 정확 매칭)는 정규화한 질문 텍스트가 같을 때만 재사용
+# TTL + 최대 개수(LRU), 인덱스가 바뀌면 invalidate()로 전부 비움
+class SemanticAnswerCache:
+    def __init__(self, max_items: int, ttl: float, max_distance: float) -> None:
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._seq = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0
+
+    def _expire(self, now: float) -> None:
+        dead = [k for k, e in self._entries.items() if now - e.created_at > self.ttl]
+        for k in dead:
+            del self._entries[k]
+
+    def get(self, query_vec: Optional[np.ndarray], doc_ids: Tuple[str, ...], text: str = "") -> Optional[Any]:
+        if not self.enabled:
+            return None
+        want = frozenset(doc_ids)
+        with self._lock:
+            self._expire(time.time())
+            if query_vec is None:
+                t = normalize_text(text).lower()
+                for key, e in self._entries.items():
+                    if e.doc_ids == want and e.text == t:
+                        self._entries.move_to_end(key)
+                        return e.value
+                return None
+
+            q = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+            cands = [(k, e) for k, e in self._entries.items() if e.doc_ids == want and e.vec is not None]
+            if not cands:
+                return None
+            # 벡터는 L2 정규화 상태 -> 거리 = 1 - 내적
+            sims = np.stack([e.vec for _, e in cands]) @ q
+            best = int(np.argmax(sims))
+            if 1.0 - float(sims[best]) > self.max_distance:
+                return None
+            key, entry = cands[best]
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, query_vec: Optional[np.ndarray], doc_ids: Tuple[str, ...], value: Any, text: str = "") -> None:
+        if not self.enabled:
+            return
+        vec = np.array(query_vec, dtype=np.float32).reshape(-1) if query_vec is not None else None
+        with self._lock:
+            self._seq += 1
+            self._entries[self._seq] = _Entry(vec, normalize_text(text).lower(), frozenset(doc_ids), value, time.time())
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from fastapi import HTTPException
+
+from core.ingest import classify
+
+# 인덱스 번들: 이미 임베딩한 문서를 다른 환경으로 옮겨서 재임베딩 없이 바로 검색
+# tar 안의 파일 구성은 local 저장소와 같음 (풀면 그대로 LOCAL_STORE_DIR 로 쓸 수 있음)
+#   docs.jsonl       저장소 문서 행 (namespace, doc_id, content_hash, ...)
+#   embeddings.npy   float32 (count x dim), docs.jsonl 과 같은 순서
+#   store_meta.json  dim / count + embed_model / namespace별 문서 수·spec_version·spec_hash
+BUNDLE_VERSION = 1
+_DOCS = "docs.jsonl"
+_VECS = "embeddings.npy"
+_META = "store_meta.json"
+
+
+def spec_hash(hashes: Dict[str, str]) -> str:
+    # namespace 안 문서들의 (doc_id, content_hash) -> 스펙 내용 + 임베딩 모델이 같으면 같은 값
+    h = hashlib.sha256()
+    for doc_id in sorted(hashes):
+        h.update(f"{doc_id}\t{hashes[doc_id]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def write_bundle(store: Any, path: str, embed_model: str, namespaces: Optional[List[str]] = None) -> Dict[str, Any]:
+    work = tempfile.mkdtemp(prefix="bundle-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        count = 0
+        dim = 0
+        ns_info: Dict[str, Dict[str, Any]] = {}
+        ns_hashes: Dict[str, Dict[str, str]] = {}
+        raw_path = os.path.join(work, "embeddings.raw")
+        # 행 수를 미리 모르므로 벡터는 raw로 이어 쓰고, 끝나면 npy 헤더를 붙임 (메모리에 전부 올리지 않음)
+        with open(os.path.join(work, _DOCS), "wb") as fd, open(raw_path, "wb") as fv:
+            for docs, vecs in store.export_rows(namespaces):
+                dim = dim or int(vecs.shape[1])
+                fv.write(np.ascontiguousarray(vecs, dtype="<f4").tobytes())
+                for d in docs:
+                    d.pop("embedding", None)
+                    fd.write((json.dumps(d, ensure_ascii=False) + "\n").encode("utf-8"))
+                    ns = d.get("namespace") or ""
+                    info = ns_info.setdefault(ns, {"docs": 0, "spec_version": d.get("spec_version")})
+                    info["docs"] += 1
+                    ns_hashes.setdefault(ns, {})[d["doc_id"]] = d.get("content_hash", "")
+                count += len(docs)
+        if count == 0:
+            raise HTTPException(400, "내보낼 문서가 없습니다.")
+
+        with open(os.path.join(work, _VECS), "wb") as f, open(raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(f, {"descr": "<f4", "fortran_order": False, "shape": (count, dim)})
+            shutil.copyfileobj(raw, f, 1 << 20)
+        os.remove(raw_path)
+
+        for ns, info in ns_info.items():
+            info["spec_hash"] = spec_hash(ns_hashes[ns])
+        meta = {
+            "dim": dim,
+            "count": count,
+            "bundle_version": BUNDLE_VERSION,
+            "embed_model": embed_model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "namespaces": ns_info,
+        }
+        with open(os.path.join(work, _META), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        tmp = f"{path}.tmp"
+        with tarfile.open(tmp, "w") as tar:
+            for name in (_META, _DOCS, _VECS):
+                tar.add(os.path.join(work, name), arcname=name)
+        os.replace(tmp, path)
+        return meta
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def extract_bundle(path: str, dest: str) -> Dict[str, Any]:
+    # 알려진 세 파일만 꺼냄 (tar 안의 경로/링크는 쓰지 않음)
+    try:
+        with tarfile.open(path, "r:*") as tar:
+            for name in (_META, _DOCS, _VECS):
+                try:
+                    member = tar.getmember(name)
+                except KeyError:
+                    raise HTTPException(400, f"번들에 {name} 이(가) 없습니다.")
+                src = tar.extractfile(member) if member.isfile() else None
+                if src is None:
+                    raise HTTPException(400, f"번들의 {name} 이(가) 일반 파일이 아닙니다.")
+                with src, open(os.path.join(dest, name), "wb") as out:
+                    shutil.copyfileobj(src, out, 1 << 20)
+    except tarfile.TarError as e:
+        raise HTTPException(400, f"번들 파일을 읽을 수 없습니다. (error={str(e)[:180]})")
+    with open(os.path.join(dest, _META), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_bundle(meta: Dict[str, Any], embed_model: str, dim: Optional[int]) -> None:
+    if meta.get("bundle_version") != BUNDLE_VERSION:
+        raise HTTPException(400, f"지원하지 않는 번들 버전입니다. (bundle={meta.get('bundle_version')}, expected={BUNDLE_VERSION})")
+    if meta.get("embed_model") != embed_model:
+        raise HTTPException(
+            409,
+            f"번들의 임베딩 모델이 이 서버와 다릅니다. (bundle={meta.get('embed_model')}, server={embed_model}) "
+            "같은 모델로 ingest 하세요.",
+        )
+    if dim is not None and int(meta.get("dim", 0)) != dim:
+        raise HTTPException(409, f"번들의 임베딩 차원이 이 서버와 다릅니다. (bundle={meta.get('dim')}, server={dim})")
+
+
+def load_bundle(
+    store: Any, src: str, embed_model: str, dim: Optional[int], namespaces: Optional[List[str]] = None
+) -> Dict[str, Dict[str, int]]:
+    # src: 풀어 놓은 번들 디렉터리. 번들에 있는 namespace는 번들 내용과 같아지도록
+    # (바뀐 문서만 upsert, 번들에 없는 문서는 삭제). 반환: namespace별 added/changed/unchanged/removed
+    with open(os.path.join(src, _META), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    check_bundle(meta, embed_model, dim)
+
+    # 벡터는 mmap으로 열어 필요한 행만 읽음 (파일 전체를 메모리로 복사하지 않음)
+    vecs = np.load(os.path.join(src, _VECS), mmap_mode="r")
+    if vecs.ndim != 2 or vecs.shape[0] != int(meta.get("count", -1)):
+        raise HTTPException(400, f"번들이 손상되었습니다. (meta count={meta.get('count')}, vecs={vecs.shape})")
+
+    with open(os.path.join(src, _DOCS), "rb") as f:
+        n_docs = sum(1 for line in f if line.strip())
+    if n_docs != vecs.shape[0]:
+        raise HTTPException(400, f"번들이 손상되었습니다. (docs={n_docs}, vecs={vecs.shape[0]})")
+
+    wanted: Set[str] = set(meta.get("namespaces") or {})
+    if namespaces is not None:
+        wanted &= set(namespaces)
+    stored = {ns: store.doc_hashes(ns) for ns in wanted}
+    seen: Dict[str, Set[str]] = {ns: set() for ns in wanted}
+    counts = {ns: {"added": 0, "changed": 0, "unchanged": 0, "removed": 0} for ns in wanted}
+
+    batch = int(getattr(store, "IMPORT_BATCH", 0) or 0)
+    pending: List[Dict[str, Any]] = []
+    rows: List[int] = []
+
+    def flush() -> None:
+        if not pending:
+            return
+        idx = np.asarray(rows, dtype=np.int64)
+        # 전부 순서대로면 mmap 그대로 넘김
+        block = vecs if idx.size == vecs.shape[0] and idx[-1] == idx.size - 1 else vecs[idx]
+        store.upsert_docs(list(pending), block)
+        pending.clear()
+        rows.clear()
+
+    i = -1
+    with open(os.path.join(src, _DOCS), "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            i += 1
+            d = json.loads(line)
+            ns = d.get("namespace") or ""
+            if ns not in wanted:
+                continue
+            seen[ns].add(d["doc_id"])
+            status = classify(d, stored[ns])
+            counts[ns][status] += 1
+            if status == "unchanged":
+                continue
+            pending.append(d)
+            rows.append(i)
+            if batch and len(pending) >= batch:
+                flush()
+    flush()
+
+    for ns in wanted:
+        stale = [doc_id for doc_id in stored[ns] if doc_id not in seen[ns]]
+        counts[ns]["removed"] = store.delete_docs(ns, stale) if stale else 0
+    return counts
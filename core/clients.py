@@ -0,0 +1,57 @@
+from __future__ import annotations
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+from fastapi import HTTPException
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+from core.config import OPENAI_API_KEY, OPENAI_BASE_URL
+
+# 프로세스 전체에서 공유하는 클라이언트들 (요청마다 새로 만들지 않음)
+# 처음 쓸 때 만들고, 앱 시작 시 lifespan warm-up에서 미리 연결해 둠
+_openai: Optional[AsyncOpenAI] = None
+_http: Optional[httpx.AsyncClient] = None
+
+
+def openai_client() -> AsyncOpenAI:
+    global _openai
+    if not OPENAI_API_KEY:
+        raise HTTPException(500, "OPENAI_API_KEY가 없습니다.")
+    if _openai is None:
+        from openai import AsyncOpenAI  # import 비용이 커서 처음 쓸 때
+
+        _openai = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            http_client=httpx.AsyncClient(
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+            ),
+        )
+    return _openai
+
+
+def http_client() -> httpx.AsyncClient:
+    # 스펙 탐색/다운로드용. 여러 사용자의 인증 헤더가 섞이지 않도록 쿠키는 저장하지 않음
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(20.0, read=60.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            cookies=httpx.Cookies(CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))),
+        )
+    return _http
+
+
+async def aclose() -> None:
+    global _openai, _http
+    if _openai is not None:
+        await _openai.close()
+        _openai = None
+    if _http is not None:
+        await _http.aclose()
+        _http = None
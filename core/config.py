@@ -8,11 +8,33 @@ MONGODB_URI = os.getenv("MONGODB_URI", "")
 MONGODB_DB = os.getenv("MONGODB_DB", "")
 MONGODB_COL = os.getenv("MONGODB_COL", "")
 VECTOR_INDEX = os.getenv("VECTOR_INDEX", "")
+# embedding 저장 형식: float32 | int8 (BSON binary vector) | array (예전 방식, double 배열)
+MONGO_VECTOR_DTYPE = os.getenv("MONGO_VECTOR_DTYPE", "float32").lower()
+MONGO_WRITE_CHUNK_BYTES = int(os.getenv("MONGO_WRITE_CHUNK_BYTES", str(8 * 1024 * 1024)))
+MONGO_WRITE_CONCURRENCY = int(os.getenv("MONGO_WRITE_CONCURRENCY", "4"))
+MONGO_SEARCH_CONCURRENCY = int(os.getenv("MONGO_SEARCH_CONCURRENCY", "8"))
 
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "") or None
+
+# LLM에 보내는 CONTEXT 최대 토큰 (tiktoken 있으면 실제 토큰, 없으면 추정치)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+
+# 임베딩 백엔드: openai | local (CPU 해싱 임베딩, API 키/네트워크 불필요)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openai").lower()
+LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "1024"))
+
+# Embedding 배치 (OpenAI 요청당 입력 2048개 / 300k 토큰 제한보다 여유 있게)
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+# 경로/operationId 정확 매칭 시 임베딩 생략 + BM25 융합 (0이면 벡터 검색만)
+LEXICAL_INDEX = os.getenv("LEXICAL_INDEX", "1") == "1"
 
 DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", "5"))
 DEFAULT_THRESHOLD = float(os.getenv("DEFAULT_THRESHOLD", "0.80"))
@@ -21,3 +43,54 @@ FALLBACK_MESSAGE = os.getenv(
     "FALLBACK_MESSAGE",
     "문서 근거를 찾지 못했습니다. 기능 키워드 또는 엔드포인트 경로를 포함해 다시 질문해주세요.",
 )
+
+# Vector store ("mongo" | "local")
+VECTOR_STORE = os.getenv("VECTOR_STORE", "mongo").lower()
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", "data")
+# local 저장소 근사 검색(IVF + int8): 문서가 ANN_MIN_ROWS 이상일 때만, nprobe가 클수록 정확/느림
+ANN_INDEX = os.getenv("ANN_INDEX", "ivf").lower()  # ivf | off
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "50000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_RERANK = int(os.getenv("ANN_RERANK", "4"))
+DEFAULT_NAMESPACE = os.getenv("DEFAULT_NAMESPACE", "default")
+
+# Embedding cache (빈 값이면 비활성화)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "data/embed_cache.sqlite")
+EMBED_CACHE_MAX_ITEMS = int(os.getenv("EMBED_CACHE_MAX_ITEMS", "200000"))
+
+# /chat/batch: 한 번에 받을 질문 수, 동시에 보낼 LLM 호출 수
+CHAT_BATCH_MAX = int(os.getenv("CHAT_BATCH_MAX", "64"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+
+# chat 단계별 동시 실행 수 (0이면 제한 없음) / 단계마다 대기 가능한 요청 수 (넘으면 429)
+CHAT_EMBED_CONCURRENCY = int(os.getenv("CHAT_EMBED_CONCURRENCY", "16"))
+CHAT_SEARCH_CONCURRENCY = int(os.getenv("CHAT_SEARCH_CONCURRENCY", "32"))
+CHAT_LLM_CONCURRENCY = int(os.getenv("CHAT_LLM_CONCURRENCY", "16"))
+CHAT_QUEUE_MAX = int(os.getenv("CHAT_QUEUE_MAX", "64"))
+# 같은 질문이 동시에 들어오면 한 번만 계산해서 결과 공유
+CHAT_COALESCE = os.getenv("CHAT_COALESCE", "1") == "1"
+
+# operation 문서별 답변 미리 생성 (ingest 때 LLM 호출, 요청에 precompute_answers가 없으면 이 값)
+PRECOMPUTE_ANSWERS = os.getenv("PRECOMPUTE_ANSWERS", "0") == "1"
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "4"))
+# 1등 operation 점수가 threshold 이상이고 2등보다 이만큼 높으면 미리 만든 답변을 그대로 사용
+PRECOMPUTED_MARGIN = float(os.getenv("PRECOMPUTED_MARGIN", "0.05"))
+
+# /chat 의미 기반 답변 캐시 (ANSWER_CACHE_SIZE=0 이면 비활성화)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.08"))
+
+# Ingest job pipeline
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "50"))
+# 저장소 쓰기(ingest/import/reset)는 한 번에 하나씩, 대기+실행 중인 ingest가 이 수 이상이면 429
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "8"))
+SPEC_MAX_BYTES = int(os.getenv("SPEC_MAX_BYTES", str(200 * 1024 * 1024)))
+SPEC_RESOLVE_TTL = float(os.getenv("SPEC_RESOLVE_TTL", "600"))
+
+# 대형 스펙 병렬 문서 생성 (PARSE_WORKERS=0 이면 항상 직렬)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+PARSE_PARALLEL_MIN_PATHS = int(os.getenv("PARSE_PARALLEL_MIN_PATHS", "2000"))
+PARSE_CHUNK_PATHS = int(os.getenv("PARSE_CHUNK_PATHS", "500"))
@@ -0,0 +1,93 @@
+from __future__ import annotations
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+# (임베딩 모델, 정규화 텍스트 해시) -> float32 벡터
+# sqlite 한 파일에 저장하고, 개수가 max_items를 넘으면 가장 오래 안 쓴 것부터 삭제(LRU)
+class EmbeddingCache:
+    def __init__(self, path: str, max_items: int) -> None:
+        self.path = path
+        self.max_items = max(1, max_items)
+        self._lock = threading.Lock()
+
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return f"{model}:{text_hash(text)}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        uniq = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            # sqlite 바인딩 변수 개수 제한 때문에 나눠서 조회
+            for i in range(0, len(uniq), 500):
+                chunk = uniq[i : i + 500]
+                marks = ",".join("?" * len(chunk))
+                for k, dim, blob in self._conn.execute(
+                    f"SELECT key, dim, vec FROM embeddings WHERE key IN ({marks})", chunk
+                ):
+                    found[k] = np.frombuffer(blob, dtype=np.float32, count=dim)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, keys: List[str], vecs: np.ndarray) -> None:
+        if not keys:
+            return
+        vecs = np.asarray(vecs, dtype=np.float32)
+        now = time.time()
+        rows = [(k, int(v.shape[0]), v.tobytes(), now) for k, v in zip(keys, vecs)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, dim, vec, last_used) VALUES (?,?,?,?)", rows
+            )
+            n = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if n > self.max_items:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (n - self.max_items,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+def open_cache(path: str, max_items: int) -> Optional[EmbeddingCache]:
+    if not path:
+        return None
+    return EmbeddingCache(path, max_items)
@@ -1,23 +1,169 @@
 from __future__ import annotations
-from typing import List
+import asyncio
+import random
+from typing import TYPE_CHECKING, Dict, List, Optional
 import numpy as np
 from fastapi import HTTPException
-from openai import OpenAI
 
-from core.config import OPENAI_API_KEY, OPENAI_EMBED_MODEL
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+from core.clients import openai_client
+from core.config import (
+    OPENAI_API_KEY,
+    OPENAI_EMBED_MODEL,
+    EMBED_BACKEND,
+    LOCAL_EMBED_DIM,
+    EMBED_CACHE_PATH,
+    EMBED_CACHE_MAX_ITEMS,
+    EMBED_BATCH_MAX_ITEMS,
+    EMBED_BATCH_MAX_TOKENS,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+)
+from core.embed_cache import EmbeddingCache, open_cache
+from core.local_embed import HashingEmbedder
+from core.metrics import metrics
+
+# 알려진 OpenAI 임베딩 차원 (저장소/인덱스 차원 확인용)
+_OPENAI_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
 
 def _l2_normalize(mat: np.ndarray) -> np.ndarray:
     eps = 1e-12
     n = np.linalg.norm(mat, axis=1, keepdims=True)
     return mat / np.maximum(n, eps)
 
+def estimate_tokens(text: str) -> int:
+    # tokenizer 없이 보수적으로 추정 (영문 ~4byte/token, 한글 ~3byte/token)
+    return len(text.encode("utf-8")) // 3 + 1
+
+def make_batches(texts: List[str], max_items: int, max_tokens: int) -> List[List[int]]:
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, t in enumerate(texts):
+        n = estimate_tokens(t)
+        if cur and (len(cur) >= max_items or cur_tokens + n > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+def _is_retryable(e: Exception) -> bool:
+    # openai 패키지는 import가 무거워서 실제로 호출한 뒤(예외가 난 뒤)에만 불러옴
+    from openai import APIStatusError, APIConnectionError
+
+    if isinstance(e, APIConnectionError):  # timeout 포함
+        return True
+    if isinstance(e, APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return False
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    from openai import APIStatusError
+
+    if isinstance(e, APIStatusError):
+        ra = e.response.headers.get("retry-after")
+        try:
+            if ra is not None:
+                return min(60.0, float(ra))
+        except ValueError:
+            pass
+    return min(30.0, 0.5 * (2 ** attempt)) + random.uniform(0, 0.25)
+
 class Embedder:
-    def __init__(self) -> None:
-        if not OPENAI_API_KEY:
-            raise HTTPException(500, "OPENAI_API_KEY가 없습니다.")
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-
-    def embed(self, texts: List[str]) -> np.ndarray:
-        resp = self.client.embeddings.create(model=OPENAI_EMBED_MODEL, input=texts)
-        vecs = np.array([d.embedding for d in resp.data], dtype=np.float32)
+    # backend = openai (API 호출) | local (HashingEmbedder, 프로세스 안에서 계산)
+    def __init__(self, backend: str = EMBED_BACKEND) -> None:
+        self.backend = backend
+        self.local: Optional[HashingEmbedder] = None
+        if backend == "local":
+            self.local = HashingEmbedder(LOCAL_EMBED_DIM)
+            self.model = self.local.model
+        elif backend == "openai":
+            if not OPENAI_API_KEY:
+                raise HTTPException(500, "OPENAI_API_KEY가 없습니다. (키 없이 쓰려면 EMBED_BACKEND=local)")
+            self.model = OPENAI_EMBED_MODEL
+        else:
+            raise HTTPException(500, f"EMBED_BACKEND 값이 잘못되었습니다. (openai | local, got={backend})")
+        self.cache = open_cache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_ITEMS)
+
+    @property
+    def dim(self) -> Optional[int]:
+        if self.local is not None:
+            return self.local.dim
+        return _OPENAI_DIMS.get(self.model)
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        # 공유 클라이언트(커넥션 풀)를 쓰되, 재시도는 _aembed_batch에서 직접 처리
+        return openai_client().with_options(max_retries=0)
+
+    async def _aembed_batch(self, texts: List[str], sem: asyncio.Semaphore) -> np.ndarray:
+        metrics.observe("embed_batch_size", len(texts))
+        metrics.inc("embed_inputs_total", len(texts))
+        async with sem:
+            attempt = 0
+            while True:
+                metrics.inc("embed_requests_total")
+                try:
+                    resp = await self.aclient.embeddings.create(model=self.model, input=texts)
+                    break
+                except Exception as e:
+                    if not _is_retryable(e) or attempt >= EMBED_MAX_RETRIES:
+                        raise HTTPException(502, f"임베딩 API 호출 실패. (error={str(e)[:180]})")
+                    await asyncio.sleep(_retry_delay(e, attempt))
+                    attempt += 1
+        # 응답 순서가 보장되지 않을 수 있어 index 기준 정렬
+        data = sorted(resp.data, key=lambda d: d.index)
+        vecs = np.array([d.embedding for d in data], dtype=np.float32)
         return _l2_normalize(vecs)
+
+    async def _aembed_local(self, texts: List[str]) -> np.ndarray:
+        # 짧은 입력(질문 1개)은 바로, 큰 배치는 스레드에서 (이벤트 루프를 막지 않도록)
+        local = self.local
+        assert local is not None
+        if len(texts) <= 8:
+            return local.embed(texts)
+        parts = [
+            await asyncio.to_thread(local.embed, texts[i : i + EMBED_BATCH_MAX_ITEMS])
+            for i in range(0, len(texts), EMBED_BATCH_MAX_ITEMS)
+        ]
+        return np.concatenate(parts, axis=0)
+
+    async def _aembed_api(self, texts: List[str]) -> np.ndarray:
+        if self.local is not None:
+            return await self._aembed_local(texts)
+        batches = make_batches(texts, EMBED_BATCH_MAX_ITEMS, EMBED_BATCH_MAX_TOKENS)
+        sem = asyncio.Semaphore(max(1, EMBED_CONCURRENCY))
+        results = await asyncio.gather(
+            *[self._aembed_batch([texts[i] for i in b], sem) for b in batches]
+        )
+        return np.concatenate(results, axis=0)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        # 배치 분할 + 동시 호출 + 429/5xx 재시도
+        if self.cache is None:
+            return await self._aembed_api(texts)
+
+        keys = [EmbeddingCache.key(self.model, t) for t in texts]
+        hits = self.cache.get_many(keys)
+        n_hit = sum(1 for k in keys if k in hits)
+        metrics.inc("cache_total", n_hit, cache="embed", result="hit")
+        metrics.inc("cache_total", len(keys) - n_hit, cache="embed", result="miss")
+
+        # 캐시 miss만 API로 (같은 텍스트는 한 번만)
+        miss_idx: Dict[str, int] = {}
+        for i, k in enumerate(keys):
+            if k not in hits and k not in miss_idx:
+                miss_idx[k] = i
+        if miss_idx:
+            miss_keys = list(miss_idx)
+            new_vecs = await self._aembed_api([texts[miss_idx[k]] for k in miss_keys])
+            self.cache.put_many(miss_keys, new_vecs)
+            hits.update(zip(miss_keys, new_vecs))
+
+        # 원래 순서대로 재조립
+        return np.stack([hits[k] for k in keys]).astype(np.float32, copy=False)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from schemas.doc import Doc
+
+
+def content_hash(d: Doc, embed_model: str) -> str:
+    # 임베딩 모델이 바뀌면 모든 문서가 changed 로 잡히도록 모델명도 포함
+    payload = json.dumps(
+        [embed_model, d.kind, d.title, d.text, d.metadata], ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def doc_to_row(d: Doc, embed_model: str, namespace: str, spec_version: Optional[str] = None) -> Dict[str, Any]:
+    # 저장소 안에서 문서 식별자는 (namespace, doc_id)
+    # spec_version은 해시에 넣지 않음 -> 내용이 그대로면 재임베딩 없이 이전 버전 값이 남음
+    return {
+        "namespace": namespace,
+        "spec_version": spec_version,
+        "doc_id": d.doc_id,
+        "kind": d.kind,
+        "title": d.title,
+        "text": d.text,
+        "metadata": d.metadata,
+        "content_hash": content_hash(d, embed_model),
+    }
+
+
+def classify(row: Dict[str, Any], stored: Dict[str, str]) -> str:
+    old = stored.get(row["doc_id"])
+    if old is None:
+        return "added"
+    if old != row["content_hash"]:
+        return "changed"
+    return "unchanged"
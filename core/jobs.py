@@ -0,0 +1,435 @@
+from __future__ import annotations
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+import numpy as np
+from fastapi import HTTPException
+
+from core.config import (
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_SIZE,
+    INGEST_MAX_JOBS,
+    INGEST_MAX_PENDING,
+    EMBED_CONCURRENCY,
+    PARSE_WORKERS,
+    PRECOMPUTE_CONCURRENCY,
+)
+from core.ingest import classify, doc_to_row
+from core.llm import llm_available
+from core.metrics import metrics, stage
+from core.openapi_fetch import resolve_spec_url, download_spec
+from core.openapi_stream import SpecSource
+from core.openapi_parse import RefResolver, iter_docs
+from core.precompute import answer_key, generate_answer, needs_answer
+from schemas.ingest import IngestRequest, IngestResponse
+
+_STAGES = ("parsed", "queued", "embedded", "upserted", "answered")
+
+
+class IngestJob:
+    def __init__(self, req: IngestRequest) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.req = req
+        self.status = "queued"  # queued | running | done | failed
+        self.error: Optional[str] = None
+        self.error_status = 500
+        self.result: Optional[IngestResponse] = None
+        self.created_at = time.time()
+        self.counts: Dict[str, int] = {k: 0 for k in _STAGES}
+        # 단계별 누적 소요시간(초). embed/upsert는 동시에 돌아서 합이 전체 시간보다 클 수 있음
+        self.timings: Dict[str, float] = {}
+        self.log: List[Dict[str, Any]] = []
+        self.attempts = 0
+        # checkpoint: 업서트까지 끝난 doc_id -> content_hash (재시도 시 건너뜀)
+        self.done: Dict[str, str] = {}
+        self.version = 0
+        self._changed = asyncio.Event()
+        self._t0 = time.perf_counter()
+
+    def touch(self) -> None:
+        self.version += 1
+        ev, self._changed = self._changed, asyncio.Event()
+        ev.set()
+
+    def add_log(self, stage: str, msg: str) -> None:
+        self.log.append({"t": round(time.perf_counter() - self._t0, 3), "stage": stage, "msg": msg})
+        self.touch()
+
+    async def wait_change(self, version: int, timeout: float) -> None:
+        if self.version != version:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self, log_from: int = 0) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "counts": dict(self.counts),
+            "timings": {k: round(v * 1000, 1) for k, v in self.timings.items()},
+            "checkpointed": len(self.done),
+            "log": self.log[log_from:],
+            "error": self.error,
+            "result": self.result.model_dump() if self.result else None,
+        }
+
+
+# 인덱싱을 job으로 실행: parse -> embed -> upsert 단계를 bounded queue로 연결해 겹쳐서 돌림
+class IngestJobManager:
+    def __init__(self, store, embedder, on_change: Callable[[], None]) -> None:
+        self.store = store
+        self.embedder = embedder
+        self.on_change = on_change
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        # namespace -> 마지막으로 반영한 스펙의 url/etag/last_modified
+        self._fetched: Dict[str, Dict[str, Any]] = {}
+        # 저장소 쓰기(ingest/import/reset)는 한 번에 하나씩 -> reset과 upsert가 섞이지 않음
+        self._write_lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def writing(self) -> AsyncIterator[None]:
+        async with self._write_lock:
+            yield
+
+    def pending(self) -> int:
+        return sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+
+    def _admit(self) -> None:
+        # 대기 중인 ingest가 너무 많으면 받지 않음 (OpenAI 임베딩 한도를 한꺼번에 쓰지 않도록)
+        n = self.pending()
+        if INGEST_MAX_PENDING > 0 and n >= INGEST_MAX_PENDING:
+            metrics.inc("admission_rejected_total", stage="ingest")
+            raise HTTPException(
+                429,
+                f"진행 중인 ingest가 많아 지금은 받을 수 없습니다. 잠시 후 다시 시도하세요. (pending={n})",
+                headers={"Retry-After": "5"},
+            )
+
+    def create(self, req: IngestRequest) -> IngestJob:
+        self._admit()
+        job = IngestJob(req)
+        self._jobs[job.id] = job
+        # 끝난 job부터 오래된 순으로 정리
+        while len(self._jobs) > INGEST_MAX_JOBS:
+            old = next((j for j in self._jobs.values() if j.status in ("done", "failed")), None)
+            if old is None:
+                break
+            del self._jobs[old.id]
+        return job
+
+    def forget_fetched(self, namespace: Optional[str] = None) -> None:
+        # 저장소를 비우면 304여도 다시 받아야 함
+        if namespace is None:
+            self._fetched.clear()
+        else:
+            self._fetched.pop(namespace, None)
+
+    def get(self, job_id: str) -> IngestJob:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(404, f"ingest job을 찾을 수 없습니다. (job_id={job_id})")
+        return job
+
+    def start(self, job: IngestJob) -> None:
+        task = asyncio.create_task(self.run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def retry(self, job_id: str) -> IngestJob:
+        job = self.get(job_id)
+        if job.status != "failed":
+            raise HTTPException(409, f"실패한 job만 재시도할 수 있습니다. (status={job.status})")
+        self._admit()
+        job.status = "queued"
+        job.error = None
+        job.touch()
+        self.start(job)
+        return job
+
+    async def run(self, job: IngestJob) -> None:
+        if self._write_lock.locked():
+            job.add_log("wait", "다른 ingest/import/reset이 끝나기를 기다립니다.")
+        async with self.writing():
+            await self._run(job)
+
+    async def _run(self, job: IngestJob) -> None:
+        job.status = "running"
+        job.attempts += 1
+        job.counts = {k: 0 for k in _STAGES}
+        job.timings = {}
+        if job.done:
+            job.add_log("resume", f"checkpoint {len(job.done)}개 문서는 건너뜁니다.")
+        try:
+            job.result = await self._pipeline(job)
+            job.status = "done"
+            job.add_log("timings", ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in job.timings.items()))
+            job.add_log("done", job.result.model_dump_json())
+            r = job.result
+            for kind in ("added", "changed", "removed", "unchanged"):
+                metrics.inc("ingest_docs_total", getattr(r, kind), kind=kind)
+            metrics.inc("ingest_jobs_total", status="done")
+        except HTTPException as e:
+            job.status = "failed"
+            job.error = str(e.detail)
+            job.error_status = e.status_code
+            job.add_log("failed", job.error)
+            metrics.inc("ingest_jobs_total", status="failed")
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {str(e)[:300]}"
+            job.error_status = 500
+            job.add_log("failed", job.error)
+            metrics.inc("ingest_jobs_total", status="failed")
+
+    def _write(self, job: IngestJob, rows: List[Dict[str, Any]], vecs: np.ndarray) -> None:
+        # checkpoint 기록까지 스레드 안에서 -> 취소돼도 이미 쓴 배치는 기록됨
+        self.store.upsert_docs(rows, vecs)
+        for r in rows:
+            job.done[r["doc_id"]] = r["content_hash"]
+
+    async def _pipeline(self, job: IngestJob) -> IngestResponse:
+        req = job.req
+        with stage("resolve", job.timings):
+            spec_url = await resolve_spec_url(req.url, req.headers)
+        job.add_log("resolve", f"{spec_url} ({_ms(job.timings, 'resolve')})")
+
+        # 같은 옵션으로 이미 반영한 스펙이면 조건부 요청, 304면 파싱/임베딩 없이 종료
+        sig = _options_sig(req, self.embedder.model)
+        prev = self._fetched.get(req.namespace)
+        usable = (
+            prev is not None and prev["spec_url"] == spec_url and prev["sig"] == sig
+            and req.incremental and not job.done
+        )
+        with stage("fetch", job.timings):
+            source = await download_spec(spec_url, req.headers, prev if usable else None)
+        if source is None:
+            job.add_log("fetch", f"304 Not Modified, 변경 없음 ({_ms(job.timings, 'fetch')})")
+            return IngestResponse(
+                resolved_spec_url=spec_url, namespace=req.namespace, version=prev["version"],
+                docs=prev["docs"], dim=prev["dim"], unchanged=prev["docs"], not_modified=True,
+            )
+        job.add_log(
+            "fetch",
+            f"스펙 다운로드 완료 ({source.fmt}, {os.path.getsize(source.path)} bytes, {_ms(job.timings, 'fetch')})",
+        )
+        # 도중에 실패해도 저장소가 바뀌었을 수 있으니 먼저 비움
+        self._fetched.pop(req.namespace, None)
+        try:
+            result = await self._process(job, spec_url, source)
+        finally:
+            source.close()
+
+        if source.etag or source.last_modified:
+            self._fetched[req.namespace] = {
+                "spec_url": spec_url, "etag": source.etag, "last_modified": source.last_modified,
+                "sig": sig, "version": result.version, "docs": result.docs, "dim": result.dim,
+            }
+        return result
+
+    async def _process(self, job: IngestJob, spec_url: str, source: SpecSource) -> IngestResponse:
+        req = job.req
+        ns = req.namespace
+        version = req.version
+        if version is None:
+            with stage("parse", job.timings):
+                version = (await asyncio.to_thread(source.info)).get("version")
+            version = str(version) if version is not None else None
+
+        with stage("diff", job.timings):
+            stored = await asyncio.to_thread(self.store.doc_hashes, ns)
+        # 증분이면 저장소 해시 + checkpoint 기준으로 건너뜀, 전체면 checkpoint만
+        skip = {**stored, **job.done} if req.incremental else dict(job.done)
+
+        workers = max(1, EMBED_CONCURRENCY)
+        embed_q: asyncio.Queue = asyncio.Queue(maxsize=max(1, INGEST_QUEUE_SIZE))
+        upsert_q: asyncio.Queue = asyncio.Queue(maxsize=max(1, INGEST_QUEUE_SIZE))
+        seen: Set[str] = set()
+        kinds = {"added": 0, "changed": 0, "unchanged": 0}
+        dim = 0
+
+        async def parse_stage() -> None:
+            with stage("parse", job.timings):
+                components = await asyncio.to_thread(source.components)
+            schemas = components.get("schemas")
+            docs = iter_docs(
+                source.path_items(),
+                schemas.items() if isinstance(schemas, dict) else [],
+                include_operations=req.include_operations,
+                include_schemas=req.include_schemas,
+                max_text_chars=req.max_text_chars,
+                resolver=RefResolver({"components": components}),
+                workers=PARSE_WORKERS,
+            )
+            batch: List[Dict[str, Any]] = []
+            while True:
+                # 파싱은 CPU 작업이라 스레드에서 조금씩 꺼냄 (이벤트 루프를 막지 않도록)
+                with stage("parse", job.timings):
+                    chunk = await asyncio.to_thread(lambda: list(islice(docs, INGEST_BATCH_SIZE)))
+                if not chunk:
+                    break
+                for d in chunk:
+                    if d.doc_id in seen:
+                        continue
+                    seen.add(d.doc_id)
+                    row = doc_to_row(d, self.embedder.model, ns, version)
+                    job.counts["parsed"] += 1
+
+                    if skip.get(row["doc_id"]) == row["content_hash"]:
+                        kinds["unchanged"] += 1
+                        continue
+                    kinds[classify(row, stored)] += 1
+                    batch.append(row)
+                    if len(batch) >= INGEST_BATCH_SIZE:
+                        job.counts["queued"] += len(batch)
+                        await embed_q.put(batch)
+                        job.touch()
+                        batch = []
+            if batch:
+                job.counts["queued"] += len(batch)
+                await embed_q.put(batch)
+            job.add_log(
+                "parse",
+                f"{job.counts['parsed']}개 문서, 임베딩 대상 {job.counts['queued']}개 ({_ms(job.timings, 'parse')})",
+            )
+            for _ in range(workers):
+                await embed_q.put(None)
+
+        async def embed_stage() -> None:
+            nonlocal dim
+            while True:
+                batch = await embed_q.get()
+                if batch is None:
+                    break
+                with stage("embed", job.timings):
+                    vecs = await self.embedder.aembed([r["text"] for r in batch])
+                dim = int(vecs.shape[1])
+                job.counts["embedded"] += len(batch)
+                job.touch()
+                await upsert_q.put((batch, vecs))
+            await upsert_q.put(None)
+
+        async def upsert_stage() -> None:
+            finished = 0
+            while finished < workers:
+                items = [await upsert_q.get()]
+                # 밀려 있는 배치는 한 번에 모아서 쓰기
+                while not upsert_q.empty():
+                    items.append(upsert_q.get_nowait())
+                ready = [x for x in items if x is not None]
+                finished += len(items) - len(ready)
+                if not ready:
+                    continue
+
+                rows = [r for batch, _ in ready for r in batch]
+                vecs = np.vstack([v for _, v in ready])
+                metrics.observe("ingest_batch_size", len(rows))
+                with stage("upsert", job.timings):
+                    await asyncio.to_thread(self._write, job, rows, vecs)
+                job.counts["upserted"] += len(rows)
+                job.add_log(
+                    "upsert",
+                    f"{job.counts['upserted']}/{job.counts['queued']} (+{len(rows)}, embed {_ms(job.timings, 'embed')}, "
+                    f"upsert {_ms(job.timings, 'upsert')})",
+                )
+
+        await _gather_or_cancel(parse_stage(), *[embed_stage() for _ in range(workers)], upsert_stage())
+
+        if not seen:
+            raise HTTPException(400, "문서화할 operation/schema가 없습니다.")
+
+        removed_ids = [doc_id for doc_id in stored if doc_id not in seen]
+        with stage("delete", job.timings):
+            removed = await asyncio.to_thread(self.store.delete_docs, ns, removed_ids)
+        if removed:
+            job.add_log("delete", f"{removed}개 문서 삭제")
+        answered = await self._precompute(job, ns) if req.precompute_answers else 0
+        if job.counts["upserted"] or removed or answered:
+            self.on_change()
+
+        return IngestResponse(
+            resolved_spec_url=spec_url,
+            namespace=ns,
+            version=version,
+            docs=len(seen),
+            dim=dim,
+            added=kinds["added"],
+            changed=kinds["changed"],
+            removed=removed,
+            unchanged=kinds["unchanged"],
+            answered=answered,
+        )
+
+    async def _precompute(self, job: IngestJob, ns: str) -> int:
+        # operation 문서별 설명 답변을 LLM으로 미리 생성. 내용/모델/프롬프트가 그대로인 문서는 건너뜀
+        # PRECOMPUTE_CONCURRENCY개씩 동시에 호출하고, 묶음마다 저장 (도중에 실패해도 만든 답변은 남음)
+        if not llm_available():
+            job.add_log("answers", "LLM을 쓸 수 없어 답변 미리 생성을 건너뜁니다.")
+            return 0
+        with stage("diff", job.timings):
+            docs = await asyncio.to_thread(self.store.operation_docs, ns)
+        todo = [d for d in docs if needs_answer(d)]
+        if not todo:
+            return 0
+        job.add_log("answers", f"operation {len(docs)}개 중 {len(todo)}개 답변 생성")
+
+        workers = max(1, PRECOMPUTE_CONCURRENCY)
+        sem = asyncio.Semaphore(workers)
+
+        async def one(doc: Dict[str, Any]) -> Dict[str, Any]:
+            async with sem:
+                answer = await generate_answer(doc)
+            return {"doc_id": doc["doc_id"], "content_hash": doc.get("content_hash"), "answer": answer, "answer_hash": answer_key(doc)}
+
+        saved = 0
+        failed = 0
+        step = workers * 4
+        for i in range(0, len(todo), step):
+            with stage("answers", job.timings):
+                results = await asyncio.gather(*(one(d) for d in todo[i : i + step]), return_exceptions=True)
+            ok = [r for r in results if not isinstance(r, BaseException) and r["answer"]]
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors and not failed:
+                job.add_log("answers", f"답변 생성 실패: {type(errors[0]).__name__}: {str(errors[0])[:180]}")
+            failed += len(results) - len(ok)
+            if ok:
+                with stage("upsert", job.timings):
+                    saved += await asyncio.to_thread(self.store.set_answers, ns, ok)
+            job.counts["answered"] = saved
+            job.add_log("answers", f"{saved}/{len(todo)} (실패 {failed}, {_ms(job.timings, 'answers')})")
+            if errors and len(errors) == len(results) and not saved:
+                # 첫 묶음이 전부 실패 (키/모델 설정 오류 등) -> 나머지는 시도하지 않음
+                break
+        metrics.inc("precomputed_answers_total", saved, result="generated")
+        metrics.inc("precomputed_answers_total", failed, result="failed")
+        return saved
+
+
+def _ms(timings: Dict[str, float], name: str) -> str:
+    return f"{timings.get(name, 0.0) * 1000:.0f}ms"
+
+
+def _options_sig(req: IngestRequest, model: str) -> tuple:
+    # 옵션이 바뀌면 스펙이 같아도 문서가 달라짐
+    return (req.include_operations, req.include_schemas, req.max_text_chars, model, req.precompute_answers)
+
+
+async def _gather_or_cancel(*coros) -> None:
+    # 한 단계가 실패하면 나머지 단계도 취소 (queue에서 영원히 기다리지 않도록)
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
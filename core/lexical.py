@@ -0,0 +1,232 @@
+from __future__ import annotations
+import asyncio
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+_HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD", "TRACE")
+
+# "POST /users/{id}/roles", "/users/123/roles" 같은 경로 표기
+_PATH_RE = re.compile(
+    r"(?:\b(" + "|".join(_HTTP_METHODS) + r")\s+)?(?<![A-Za-z0-9])(/[A-Za-z0-9_.~{}:%\-/]*[A-Za-z0-9_}~\-])",
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+|[가-힣]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+_K1 = 1.2
+_B = 0.75
+_RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    # 소문자 단어 + camelCase/snake_case 분해 (createOrder -> createorder, create, order)
+    out: List[str] = []
+    for w in _WORD_RE.findall(text or ""):
+        lw = w.lower()
+        out.append(lw)
+        parts = [p.lower() for s in w.split("_") for p in _CAMEL_RE.findall(s)]
+        if len(parts) > 1:
+            out.extend(p for p in parts if p != lw)
+    return out
+
+
+def _segments(path: str) -> List[str]:
+    return [s for s in path.strip().rstrip("/").split("/") if s]
+
+
+def _is_param(seg: str) -> bool:
+    return seg.startswith("{") and seg.endswith("}")
+
+
+class _PathNode:
+    __slots__ = ("lit", "var", "ops")
+
+    def __init__(self) -> None:
+        self.lit: Dict[str, _PathNode] = {}
+        self.var: Optional[_PathNode] = None
+        self.ops: List[int] = []
+
+
+class LexicalIndex:
+    # ingest된 문서 메타데이터(method/path/operationId/tags/schema)와 본문으로 만드는 메모리 인덱스
+    # - 경로 템플릿 트라이: /users/123/roles 가 /users/{id}/roles 에 매칭
+    # - operationId / schema 이름 정확 매칭
+    # - 본문 BM25
+    # 정확 매칭이면 임베딩 없이 바로 답하고, 아니면 벡터 결과와 RRF로 합침
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._alock: Optional[asyncio.Lock] = None
+        self._dirty = True
+        self._docs: List[Dict[str, Any]] = []
+        self._root = _PathNode()
+        self._op_ids: Dict[str, List[int]] = {}
+        self._schemas: Dict[str, List[int]] = {}
+        self._tags: Dict[str, List[int]] = {}
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lens: List[int] = []
+        self._avg_len = 1.0
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+
+    async def refresh(self, load: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+        # 인덱스가 바뀐 뒤 처음 쓰일 때 한 번만 다시 만듦
+        if not self._dirty:
+            return
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        async with self._alock:
+            if self._dirty:
+                self._dirty = False
+                try:
+                    await asyncio.to_thread(lambda: self.build(load()))
+                except BaseException:
+                    self._dirty = True
+                    raise
+
+    def build(self, docs: Iterable[Dict[str, Any]]) -> None:
+        items: List[Dict[str, Any]] = []
+        root = _PathNode()
+        op_ids: Dict[str, List[int]] = {}
+        schemas: Dict[str, List[int]] = {}
+        tags: Dict[str, List[int]] = {}
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lens: List[int] = []
+
+        for d in docs:
+            i = len(items)
+            items.append(d)
+            meta = d.get("metadata") or {}
+            if d.get("kind") == "operation" and meta.get("path"):
+                node = root
+                for seg in _segments(str(meta["path"])):
+                    if _is_param(seg):
+                        node.var = node.var or _PathNode()
+                        node = node.var
+                    else:
+                        node = node.lit.setdefault(seg.lower(), _PathNode())
+                node.ops.append(i)
+                if meta.get("operationId"):
+                    op_ids.setdefault(str(meta["operationId"]).lower(), []).append(i)
+                for t in meta.get("tags") or []:
+                    tags.setdefault(str(t).lower(), []).append(i)
+            elif d.get("kind") == "schema" and meta.get("schema"):
+                schemas.setdefault(str(meta["schema"]).lower(), []).append(i)
+
+            toks = tokenize(f"{d.get('title', '')}\n{d.get('text', '')}")
+            lens.append(len(toks))
+            for tok, tf in Counter(toks).items():
+                postings.setdefault(tok, []).append((i, tf))
+
+        with self._lock:
+            self._docs = items
+            self._root = root
+            self._op_ids = op_ids
+            self._schemas = schemas
+            self._tags = tags
+            self._postings = postings
+            self._lens = lens
+            self._avg_len = (sum(lens) / len(lens)) if lens else 1.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _match_path(self, root: _PathNode, segs: List[str]) -> List[int]:
+        # 리터럴 세그먼트 우선, 없으면 {param} 자리로
+        def walk(node: _PathNode, i: int) -> List[int]:
+            if i == len(segs):
+                return node.ops
+            seg = segs[i]
+            if _is_param(seg):
+                # 질문에 템플릿 그대로 쓴 경우 ({userId} vs {id})
+                return walk(node.var, i + 1) if node.var else []
+            nxt = node.lit.get(seg.lower())
+            found = walk(nxt, i + 1) if nxt else []
+            if not found and node.var:
+                found = walk(node.var, i + 1)
+            return found
+
+        return walk(root, 0)
+
+    def exact(self, query: str, namespaces: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # 질문에 엔드포인트 경로나 operationId가 그대로 들어 있으면 해당 문서들
+        with self._lock:
+            docs, root, op_ids = self._docs, self._root, self._op_ids
+        allowed = set(namespaces) if namespaces is not None else None
+
+        hits: List[int] = []
+        for m in _PATH_RE.finditer(query):
+            method = (m.group(1) or "").upper()
+            for i in self._match_path(root, _segments(m.group(2))):
+                if method and (docs[i].get("metadata") or {}).get("method") != method:
+                    continue
+                hits.append(i)
+        for w in _WORD_RE.findall(query):
+            hits.extend(op_ids.get(w.lower(), ()))
+
+        out: List[int] = []
+        seen: Set[int] = set()
+        for i in hits:
+            if i in seen or (allowed is not None and docs[i].get("namespace") not in allowed):
+                continue
+            seen.add(i)
+            out.append(i)
+        return [dict(docs[i]) for i in out]
+
+    def bm25(self, query: str, k: int, namespaces: Optional[List[str]] = None) -> List[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            docs, postings, lens, avg = self._docs, self._postings, self._lens, self._avg_len
+            schemas, tags = self._schemas, self._tags
+        if not docs:
+            return []
+        allowed = set(namespaces) if namespaces is not None else None
+        n = len(docs)
+
+        scores: Dict[int, float] = {}
+        q_toks = set(tokenize(query))
+        for tok in q_toks:
+            plist = postings.get(tok)
+            if not plist:
+                continue
+            idf = math.log(1.0 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for i, tf in plist:
+                denom = tf + _K1 * (1.0 - _B + _B * lens[i] / avg)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (_K1 + 1.0) / denom
+        # schema 이름 / tag 가 질문 단어와 같으면 가산
+        for tok in q_toks:
+            for i in schemas.get(tok, ()):
+                scores[i] = scores.get(i, 0.0) + 2.0
+            for i in tags.get(tok, ()):
+                scores[i] = scores.get(i, 0.0) + 0.5
+
+        ranked = sorted(
+            ((i, s) for i, s in scores.items() if allowed is None or docs[i].get("namespace") in allowed),
+            key=lambda x: -x[1],
+        )
+        return [(dict(docs[i]), s) for i, s in ranked[: max(1, k)]]
+
+
+def fuse(
+    vector: List[Tuple[Dict[str, Any], float]],
+    lexical: List[Dict[str, Any]],
+    k: int,
+) -> List[Tuple[Dict[str, Any], float]]:
+    # Reciprocal Rank Fusion. 점수(score)는 벡터 코사인 값을 유지 (threshold 게이트가 이 값을 씀)
+    # 벡터 결과에 없던 문서는 코사인을 모르므로 0.0
+    def key(d: Dict[str, Any]) -> Tuple[Any, Any]:
+        return d.get("namespace"), d.get("doc_id")
+
+    rrf: Dict[Tuple[Any, Any], float] = {}
+    entries: Dict[Tuple[Any, Any], Tuple[Dict[str, Any], float]] = {}
+    for rank, (d, s) in enumerate(vector):
+        rrf[key(d)] = rrf.get(key(d), 0.0) + 1.0 / (_RRF_K + rank + 1)
+        entries[key(d)] = (d, s)
+    for rank, d in enumerate(lexical):
+        rrf[key(d)] = rrf.get(key(d), 0.0) + 1.0 / (_RRF_K + rank + 1)
+        entries.setdefault(key(d), (d, 0.0))
+
+    order = sorted(rrf, key=lambda x: -rrf[x])
+    return [entries[x] for x in order[: max(1, k)]]
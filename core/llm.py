@@ -1,35 +1,119 @@
 from __future__ import annotations
-import json
-from typing import Any, Dict, List, Tuple
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
 
-from openai import OpenAI
-from fastapi import HTTPException
+from core.clients import openai_client
+from core.config import OPENAI_API_KEY, OPENAI_CHAT_MODEL, FALLBACK_MESSAGE, CONTEXT_MAX_TOKENS
+from core.embedder import estimate_tokens
+from core.metrics import metrics
 
-from core.config import OPENAI_API_KEY, OPENAI_CHAT_MODEL, FALLBACK_MESSAGE
+_REF_LINE = re.compile(r"^( *)ref: (\S+)$")
+_SEP = "\n\n---\n\n"
 
-def build_context(results: List[Tuple[Dict[str, Any], float]], max_chars: int = 8000) -> str:
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    # tiktoken이 없거나 (폐쇄망이라) 인코딩 파일을 못 받으면 None -> 바이트 기반 추정
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(OPENAI_CHAT_MODEL)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    enc = _encoding()
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    enc = _encoding()
+    if enc is None:
+        return text.encode("utf-8")[: max(0, max_tokens - 1) * 3].decode("utf-8", "ignore")
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+def _indent_of(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+def _collapse_refs(text: str, seen: Set[str]) -> str:
+    # 앞 문서에서 이미 펼친 스키마($ref 본문)는 이름만 남김
+    lines = text.split("\n")
+    out: List[str] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        out.append(line)
+        i += 1
+        m = _REF_LINE.match(line)
+        if not m:
+            continue
+        ind = len(m.group(1))
+        j = i
+        while j < len(lines) and (not lines[j].strip() or _indent_of(lines[j]) > ind):
+            j += 1
+        while j > i and not lines[j - 1].strip():
+            j -= 1
+        if j == i:
+            continue
+        name = m.group(2)
+        if name in seen:
+            out[-1] = f"{line} (위 {name} 참고)"
+            i = j
+        else:
+            seen.add(name)
+    return "\n".join(out)
+
+def _doc_block(doc: Dict[str, Any], score: float, seen: Set[str]) -> str:
+    # method/path/operationId/tags 는 본문에 이미 있으므로 META 덤프 없이 한 줄 헤더만
+    spec = " ".join(x for x in (doc.get("namespace"), doc.get("spec_version")) if x)
+    head = f"[DOC] {doc.get('doc_id')} | {spec} | score={score:.2f}"
+    return f"{head}\n{_collapse_refs(doc.get('text', '') or '', seen)}"
+
+def build_context(
+    results: List[Tuple[Dict[str, Any], float]], max_tokens: int = CONTEXT_MAX_TOKENS
+) -> Tuple[str, int]:
+    # 점수 높은 순으로 토큰 예산 안에 들어가는 만큼 담음 (안 맞는 문서는 건너뛰고 뒤의 작은 문서는 계속 시도)
+    # 반환: (context, context 토큰 수)
+    ranked = sorted(results, key=lambda x: -x[1])
+    seen: Set[str] = set()
     blocks: List[str] = []
     total = 0
-    for doc, score in results:
-        block = (
-            f"[DOC_ID] {doc.get('doc_id')}\n"
-            f"[SCORE] {score:.4f}\n"
-            f"[TITLE] {doc.get('title')}\n"
-            f"[META] {json.dumps(doc.get('metadata', {}), ensure_ascii=False)}\n\n"
-            f"{doc.get('text','')}"
-        )
-        if total + len(block) > max_chars:
-            break
+    sep = count_tokens(_SEP)
+    for doc, score in ranked:
+        meta = doc.get("metadata") or {}
+        if doc.get("kind") == "schema" and meta.get("schema") in seen:
+            continue  # 앞 문서 안에 이미 펼쳐져 있음
+        trial = set(seen)
+        block = _doc_block(doc, score, trial)
+        n = count_tokens(block) + (sep if blocks else 0)
+        if total + n > max_tokens:
+            if blocks:
+                continue
+            # 1등 문서 하나도 안 들어가면 잘라서라도 넣음
+            block = _truncate_tokens(block, max_tokens)
+            n = count_tokens(block)
+        if doc.get("kind") == "schema" and meta.get("schema"):
+            trial.add(str(meta["schema"]))
+        seen = trial
         blocks.append(block)
-        total += len(block)
-    return "\n\n---\n\n".join(blocks)
+        total += n
+    return _SEP.join(blocks), total
 
-def make_fallback(results: List[Tuple[Dict[str, Any], float]]) -> Tuple[str, List[Dict[str, Any]]]:
+def make_citations(results: List[Tuple[Dict[str, Any], float]]) -> List[Dict[str, Any]]:
     cits: List[Dict[str, Any]] = []
     for doc, score in results[:3]:
         meta = doc.get("metadata", {}) or {}
         cits.append(
             {
+                "namespace": doc.get("namespace"),
                 "doc_id": doc.get("doc_id"),
                 "title": doc.get("title"),
                 "score": score,
@@ -37,6 +121,10 @@ def make_fallback(results: List[Tuple[Dict[str, Any], float]]) -> Tuple[str, Lis
                 "path": meta.get("path"),
             }
         )
+    return cits
+
+def make_fallback(results: List[Tuple[Dict[str, Any], float]]) -> Tuple[str, List[Dict[str, Any]]]:
+    cits = make_citations(results)
 
     if cits:
         hint = "유사 후보:\n" + "\n".join(
@@ -46,12 +134,11 @@ def make_fallback(results: List[Tuple[Dict[str, Any], float]]) -> Tuple[str, Lis
 
     return FALLBACK_MESSAGE, []
 
-def call_chat(query: str, context: str) -> str:
-    if not OPENAI_API_KEY:
-        raise HTTPException(500, "OPENAI_API_KEY가 없습니다.")
-
-    client = OpenAI(api_key=OPENAI_API_KEY)
+def _count_tokens(usage: Dict[str, Any]) -> None:
+    metrics.inc("llm_tokens_total", float(usage.get("prompt_tokens") or 0), kind="prompt")
+    metrics.inc("llm_tokens_total", float(usage.get("completion_tokens") or 0), kind="completion")
 
+def _chat_messages(query: str, context: str) -> List[Dict[str, str]]:
     system = (
         "너는 API 문서(스웨거) 기반 도우미다.\n"
         "반드시 CONTEXT 안에서만 답하고, 없으면 '문서 근거 없음'이라고 말해라.\n"
@@ -65,10 +152,45 @@ def call_chat(query: str, context: str) -> str:
         "- 가능하면 curl 예시 1개\n"
         "- 필요한 파라미터/바디 필드가 있으면 표로 정리\n"
     )
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+def prompt_tokens(query: str, context: str) -> int:
+    # 메시지당 포맷 오버헤드 ~4 토큰 + 응답 프라이밍 3 토큰 (OpenAI 기준 근사)
+    return sum(count_tokens(m["content"]) + 4 for m in _chat_messages(query, context)) + 3
+
+def llm_available() -> bool:
+    # 키가 없는 (폐쇄망 + EMBED_BACKEND=local) 배포에서는 검색 결과만 돌려줌
+    return bool(OPENAI_API_KEY)
 
-    resp = client.chat.completions.create(
+async def call_chat(query: str, context: str) -> str:
+    client = openai_client()
+
+    resp = await client.chat.completions.create(
         model=OPENAI_CHAT_MODEL,
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+        messages=_chat_messages(query, context),
         temperature=0.2,
     )
+    if getattr(resp, "usage", None) is not None:
+        _count_tokens(resp.usage.model_dump())
     return (resp.choices[0].message.content or "").strip()
+
+async def stream_chat(query: str, context: str) -> AsyncIterator[Tuple[str, Any]]:
+    # ("token", str) 를 순서대로, 마지막에 ("usage", dict) 한 번
+    client = openai_client()
+
+    stream = await client.chat.completions.create(
+        model=OPENAI_CHAT_MODEL,
+        messages=_chat_messages(query, context),
+        temperature=0.2,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    usage: Dict[str, Any] = {}
+    async for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage.model_dump()
+        for ch in chunk.choices:
+            if ch.delta and ch.delta.content:
+                yield "token", ch.delta.content
+    _count_tokens(usage)
+    yield "usage", usage
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import re
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+from core.lexical import tokenize
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+|[가-힣]+")
+
+
+class HashingEmbedder:
+    # 네트워크 없이 CPU에서 도는 임베딩: 단어 / 단어 bigram / 문자 3-gram 을 해싱해서 dim 차원에 투영
+    # - 해시는 crc32 (프로세스마다 달라지는 hash() 대신) -> 재시작해도 같은 벡터
+    # - 부호 해싱으로 충돌 편향을 줄이고, log(1+tf) 후 L2 정규화
+    # 의미 유사도는 OpenAI 모델보다 약하지만 경로/필드명/용어가 겹치는 질문에는 충분
+    def __init__(self, dim: int) -> None:
+        self.dim = max(16, dim)
+        self.model = f"local-hash-{self.dim}"
+
+    def _features(self, text: str) -> Tuple[List[int], List[float]]:
+        idx: List[int] = []
+        val: List[float] = []
+
+        def add(feat: str, w: float) -> None:
+            h = zlib.crc32(feat.encode("utf-8"))
+            idx.append(h % self.dim)
+            val.append(w if (h >> 31) & 1 else -w)
+
+        toks = tokenize(text)
+        for t in toks:
+            add("w:" + t, 1.0)
+        for a, b in zip(toks, toks[1:]):
+            add(f"b:{a} {b}", 0.5)
+        # 한글 조사/어미, 복수형 같은 변형을 문자 n-gram으로 흡수
+        for w in _WORD_RE.findall(text.lower()):
+            s = f"<{w}>"
+            for i in range(len(s) - 2):
+                add("c:" + s[i : i + 3], 0.25)
+        return idx, val
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # 배치 전체를 (행 * dim + 열) 한 번의 bincount로 누적
+        flat: List[int] = []
+        vals: List[float] = []
+        for row, t in enumerate(texts):
+            idx, val = self._features(t or "")
+            base = row * self.dim
+            flat.extend(base + i for i in idx)
+            vals.extend(val)
+        mat = np.bincount(
+            np.asarray(flat, dtype=np.int64),
+            weights=np.asarray(vals, dtype=np.float64),
+            minlength=len(texts) * self.dim,
+        ).reshape(len(texts), self.dim)
+        mat = np.sign(mat) * np.log1p(np.abs(mat))
+        norm = np.linalg.norm(mat, axis=1, keepdims=True)
+        return (mat / np.maximum(norm, 1e-12)).astype(np.float32)
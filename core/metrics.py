@@ -0,0 +1,148 @@
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 외부 의존성 없이 Prometheus text format(0.0.4)으로 내보내는 최소 구현
+# - histogram: 단계별 소요시간(stage_seconds{stage=...}), 배치 크기 등
+# - counter: 캐시 hit/miss, 토큰 사용량, 인덱싱 문서 수 등
+# 요청 단위로는 contextvar에 단계 시간을 모아서 Server-Timing 헤더로 내보냄
+
+_PREFIX = "swagger_chat_"
+_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_SIZE_BUCKETS = (1, 4, 16, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_labels(labels: _Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in esc) + "}"
+
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._hist: Dict[str, Dict[_Labels, List[float]]] = {}  # [bucket counts..., sum, count]
+        self._counters: Dict[str, Dict[_Labels, float]] = {}
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = _TIME_BUCKETS) -> None:
+        self._help[name] = ("histogram", help)
+        self._buckets[name] = tuple(buckets)
+        self._hist[name] = {}
+
+    def counter(self, name: str, help: str) -> None:
+        self._help[name] = ("counter", help)
+        self._counters[name] = {}
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        buckets = self._buckets[name]
+        with self._lock:
+            row = self._hist[name].get(key)
+            if row is None:
+                row = self._hist[name][key] = [0.0] * (len(buckets) + 2)
+            for i, b in enumerate(buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        if not value:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            data = self._counters[name]
+            data[key] = data.get(key, 0.0) + value
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, (kind, help) in self._help.items():
+                full = _PREFIX + name
+                lines.append(f"# HELP {full} {help}")
+                lines.append(f"# TYPE {full} {kind}")
+                if kind == "counter":
+                    for key, v in self._counters[name].items():
+                        lines.append(f"{full}{_fmt_labels(key)} {_fmt_num(v)}")
+                    continue
+                buckets = self._buckets[name]
+                for key, row in self._hist[name].items():
+                    for b, c in zip(buckets, row):
+                        lines.append(f"{full}_bucket{_fmt_labels(key, ('le', _fmt_num(b)))} {_fmt_num(c)}")
+                    lines.append(f"{full}_bucket{_fmt_labels(key, ('le', '+Inf'))} {_fmt_num(row[-1])}")
+                    lines.append(f"{full}_sum{_fmt_labels(key)} {_fmt_num(row[-2])}")
+                    lines.append(f"{full}_count{_fmt_labels(key)} {_fmt_num(row[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Registry()
+metrics.histogram("http_request_seconds", "HTTP 요청 처리 시간 (헤더 전송까지)")
+metrics.histogram("stage_seconds", "단계별 소요 시간 (count/lexical/embed/search/hydrate/context/llm, resolve/fetch/parse/upsert/delete)")
+metrics.histogram("embed_batch_size", "임베딩 API 요청당 입력 수", _SIZE_BUCKETS)
+metrics.histogram("ingest_batch_size", "ingest upsert 1회당 문서 수", _SIZE_BUCKETS)
+metrics.histogram("prompt_tokens", "LLM 호출당 프롬프트 토큰 수 (context 조립 후 계산)", (250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000))
+metrics.counter("embed_requests_total", "임베딩 API 호출 수 (재시도 포함)")
+metrics.counter("embed_inputs_total", "임베딩 API로 보낸 텍스트 수")
+metrics.counter("cache_total", "캐시 조회 결과 (cache=embed|answer, result=hit|miss)")
+metrics.counter("llm_tokens_total", "LLM 토큰 사용량 (kind=prompt|completion)")
+metrics.counter("chat_total", "chat 응답 수 (retrieval, used_llm)")
+metrics.counter("ingest_docs_total", "ingest 문서 수 (kind=added|changed|removed|unchanged)")
+metrics.counter("ingest_jobs_total", "끝난 ingest job 수 (status=done|failed)")
+metrics.counter("admission_rejected_total", "대기열이 차서 429로 거절한 요청 수 (stage=embed|search|llm|ingest)")
+metrics.counter("precomputed_answers_total", "ingest 때 미리 만든 operation 답변 수 (result=generated|failed)")
+metrics.counter("coalesced_total", "진행 중인 같은 질문의 결과를 공유한 chat 요청 수")
+
+
+# --- 요청 단위 단계 시간 (Server-Timing) ---
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def begin_request() -> Tuple[List[Tuple[str, float]], Token]:
+    timings: List[Tuple[str, float]] = []
+    return timings, _timings.set(timings)
+
+
+def end_request(token: Token) -> None:
+    _timings.reset(token)
+
+
+def record_stage(name: str, seconds: float, sink: Optional[Dict[str, float]] = None) -> None:
+    # histogram + 현재 요청의 Server-Timing + (ingest job 같은) 누적 dict
+    metrics.observe("stage_seconds", seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+    if sink is not None:
+        sink[name] = sink.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str, sink: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0, sink)
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    # 같은 단계가 여러 번이면 합쳐서 한 항목으로
+    merged: Dict[str, float] = {}
+    for name, sec in timings:
+        merged[name] = merged.get(name, 0.0) + sec
+    parts = [f"{name};dur={sec * 1000:.1f}" for name, sec in merged.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
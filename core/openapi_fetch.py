@@ -1,34 +1,137 @@
 from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
 import re
-from typing import Any, Dict
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
-import httpx
 from fastapi import HTTPException
 
+from core.clients import http_client
+from core.config import SPEC_MAX_BYTES, SPEC_RESOLVE_TTL
+from core.openapi_stream import SpecSource, detect_format
+
+# 입력 URL(+헤더) -> (찾은 스펙 URL, 시각). Swagger UI 주소로 다시 넣어도 탐색을 반복하지 않음
+_resolved: Dict[str, Tuple[str, float]] = {}
+_RESOLVED_MAX = 256
+
 async def fetch_json(url: str, headers: Dict[str, str]) -> Dict[str, Any]:
-    async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as c:
-        r = await c.get(url, headers=headers)
-        r.raise_for_status()
-        return r.json()
+    r = await http_client().get(url, headers=headers)
+    r.raise_for_status()
+    return r.json()
+
+async def download_spec(
+    url: str, headers: Dict[str, str], validators: Optional[Dict[str, str]] = None
+) -> Optional[SpecSource]:
+    # 응답을 메모리에 모으지 않고 임시파일로 흘려 받음 (수십 MB 스펙 대비)
+    # validators(etag/last_modified)가 있으면 조건부 요청 -> 304면 None
+    req_headers = dict(headers)
+    if validators:
+        if validators.get("etag"):
+            req_headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            req_headers["If-Modified-Since"] = validators["last_modified"]
+
+    fd, path = tempfile.mkstemp(prefix="spec-", suffix=".tmp")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with http_client().stream("GET", url, headers=req_headers) as r:
+                if r.status_code == 304 and validators:
+                    os.remove(path)
+                    return None
+                r.raise_for_status()
+                content_type = r.headers.get("content-type", "")
+                etag = r.headers.get("etag")
+                last_modified = r.headers.get("last-modified")
+                head = b""
+                async for chunk in r.aiter_bytes(1 << 16):
+                    if not head:
+                        head = chunk[:64]
+                    size += len(chunk)
+                    if size > SPEC_MAX_BYTES:
+                        raise HTTPException(413, f"스펙이 너무 큽니다. (>{SPEC_MAX_BYTES} bytes)")
+                    f.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    source = SpecSource(path, detect_format(url, content_type, head))
+    source.etag, source.last_modified = etag, last_modified
+    return source
 
 async def _fetch_text(url: str, headers: Dict[str, str]) -> str:
-    async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as c:
-        r = await c.get(url, headers=headers)
-        r.raise_for_status()
-        return r.text
+    r = await http_client().get(url, headers=headers)
+    r.raise_for_status()
+    return r.text
 
 def _origin(url: str) -> str:
     u = urlparse(url)
     return f"{u.scheme}://{u.netloc}"
 
+def _spec_url_from(base: str, data: Any) -> Optional[str]:
+    # swagger-config 형태 ({url} 또는 {urls: [{url}]})에서 스펙 URL 꺼내기
+    if not isinstance(data, dict):
+        return None
+    if "url" in data and isinstance(data["url"], str):
+        return urljoin(base + "/", data["url"].lstrip("/"))
+    if "urls" in data and isinstance(data["urls"], list) and data["urls"]:
+        first = data["urls"][0]
+        if isinstance(first, dict) and "url" in first:
+            return urljoin(base + "/", str(first["url"]).lstrip("/"))
+    return None
+
+async def _probe(c: str, base: str, headers: Dict[str, str]) -> Optional[str]:
+    try:
+        data = await fetch_json(c, headers)
+    except Exception:
+        return None
+    if isinstance(data, dict) and ("openapi" in data or "paths" in data):
+        return c
+    return _spec_url_from(base, data)
+
+async def _probe_candidates(candidates: List[str], base: str, headers: Dict[str, str]) -> Optional[str]:
+    # 후보들을 동시에 요청, 먼저 찾은 쪽이 이기고 나머지는 취소
+    tasks = [asyncio.ensure_future(_probe(c, base, headers)) for c in candidates]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            found = await fut
+            if found:
+                return found
+        return None
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def _resolve_key(url: str, headers: Dict[str, str]) -> str:
+    # 같은 URL이라도 인증 헤더가 다르면 다른 스펙일 수 있음
+    h = hashlib.sha256(json.dumps(sorted(headers.items())).encode("utf-8")).hexdigest()[:16]
+    return f"{url}#{h}"
+
 async def resolve_spec_url(url: str, headers: Dict[str, str]) -> str:
     u = url.lower()
 
     # 이미 스펙 URL이면 그대로
-    if u.endswith(".json") or u.endswith(".yaml") or "openapi" in u or "api-docs" in u:
+    if u.endswith((".json", ".yaml", ".yml")) or "openapi" in u or "api-docs" in u:
         return url
 
+    key = _resolve_key(url, headers)
+    hit = _resolved.get(key)
+    if hit and time.monotonic() - hit[1] < SPEC_RESOLVE_TTL:
+        return hit[0]
+
+    spec_url = await _discover(url, headers)
+    _resolved[key] = (spec_url, time.monotonic())
+    while len(_resolved) > _RESOLVED_MAX:
+        _resolved.pop(next(iter(_resolved)))
+    return spec_url
+
+async def _discover(url: str, headers: Dict[str, str]) -> str:
     base = _origin(url)
     candidates = [
         urljoin(base + "/", "openapi.json"),
@@ -36,21 +139,10 @@ async def resolve_spec_url(url: str, headers: Dict[str, str]) -> str:
         urljoin(base + "/", "v3/api-docs/swagger-config"),
     ]
 
-    # 흔한 후보들 먼저
-    for c in candidates:
-        try:
-            data = await fetch_json(c, headers)
-            if "openapi" in data or "paths" in data:
-                return c
-            # swagger-config 형태
-            if "url" in data and isinstance(data["url"], str):
-                return urljoin(base + "/", data["url"].lstrip("/"))
-            if "urls" in data and isinstance(data["urls"], list) and data["urls"]:
-                first = data["urls"][0]
-                if isinstance(first, dict) and "url" in first:
-                    return urljoin(base + "/", str(first["url"]).lstrip("/"))
-        except Exception:
-            pass
+    # 흔한 후보들 먼저 (동시에)
+    found = await _probe_candidates(candidates, base, headers)
+    if found:
+        return found
 
     # Swagger UI HTML에서 spec url 추출
     try:
@@ -62,13 +154,9 @@ async def resolve_spec_url(url: str, headers: Dict[str, str]) -> str:
         m2 = re.search(r'configUrl\s*:\s*"([^"]+)"', html)
         if m2:
             cfg = urljoin(base + "/", m2.group(1).lstrip("/"))
-            data = await fetch_json(cfg, headers)
-            if "url" in data:
-                return urljoin(base + "/", str(data["url"]).lstrip("/"))
-            if "urls" in data and data["urls"]:
-                first = data["urls"][0]
-                if isinstance(first, dict) and "url" in first:
-                    return urljoin(base + "/", str(first["url"]).lstrip("/"))
+            found = _spec_url_from(base, await fetch_json(cfg, headers))
+            if found:
+                return found
     except Exception:
         pass
 
@@ -76,3 +164,6 @@ async def resolve_spec_url(url: str, headers: Dict[str, str]) -> str:
         400,
         "OpenAPI 스펙 URL을 자동으로 찾지 못했습니다. /openapi.json 또는 /v3/api-docs 같은 스펙 URL을 직접 넣으세요.",
     )
+
+def clear_resolve_cache() -> None:
+    _resolved.clear()
@@ -1,7 +1,13 @@
 from __future__ import annotations
+import multiprocessing
+import os
 import re
-from typing import Any, Dict, List
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+from core.config import PARSE_PARALLEL_MIN_PATHS, PARSE_CHUNK_PATHS
 from schemas.doc import Doc
 
 _HTTP_METHODS = {"get", "post", "put", "patch", "delete", "options", "head"}
@@ -9,19 +15,74 @@ _HTTP_METHODS = {"get", "post", "put", "patch", "delete", "options", "head"}
 def _truncate(s: str, max_chars: int) -> str:
     s = re.sub(r"\s+\n", "\n", s)
     s = re.sub(r"\n{3,}", "\n\n", s)
-    s = re.sub(r"[ \t]{2,}", " ", s)
+    s = re.sub(r"(?<=\S)[ \t]{2,}", " ", s)  # 줄 앞 들여쓰기(스키마 중첩)는 유지
     return s[:max_chars]
 
 def _indent(s: str, n: int) -> str:
     pad = " " * n
     return "\n".join(pad + line for line in s.splitlines())
 
-def _summarize_schema(schema: Dict[str, Any], depth: int = 0, max_depth: int = 2) -> str:
+def _ref_name(ref: str) -> str:
+    return ref.rsplit("/", 1)[-1]
+
+class RefResolver:
+    # 스펙 하나에 대한 $ref 해석기. 컴포넌트 스키마 요약은 ref마다 한 번만 만들고 재사용
+    def __init__(self, root: Dict[str, Any]) -> None:
+        self.root = root
+        self._summaries: Dict[str, str] = {}
+        self._active: Set[str] = set()
+
+    def lookup(self, ref: str) -> Any:
+        if not ref.startswith("#/"):
+            return None  # 외부 파일 ref는 지원 안 함
+        node: Any = self.root
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def resolve(self, obj: Any) -> Any:
+        # parameters / requestBodies / responses 의 $ref 체인을 따라감 (순환이면 빈 dict)
+        seen: Set[str] = set()
+        while isinstance(obj, dict) and isinstance(obj.get("$ref"), str):
+            ref = obj["$ref"]
+            if ref in seen:
+                return {}
+            seen.add(ref)
+            obj = self.lookup(ref)
+        return obj if obj is not None else {}
+
+    def schema_summary(self, ref: str) -> str:
+        if ref in self._summaries:
+            return self._summaries[ref]
+        if ref in self._active:
+            return "(circular)"
+        self._active.add(ref)
+        try:
+            target = self.lookup(ref)
+            summary = _summarize_schema(target, 0, 2, self) if isinstance(target, dict) else ""
+        finally:
+            self._active.discard(ref)
+        self._summaries[ref] = summary
+        return summary
+
+def _summarize_schema(
+    schema: Dict[str, Any], depth: int = 0, max_depth: int = 2, resolver: Optional[RefResolver] = None
+) -> str:
     if not isinstance(schema, dict):
         return ""
 
     if "$ref" in schema:
-        return f"ref: {schema['$ref']}"
+        ref = str(schema["$ref"])
+        if resolver is None:
+            return f"ref: {ref}"
+        if depth >= max_depth:
+            return f"ref: {_ref_name(ref)}"
+        body = resolver.schema_summary(ref)
+        # 펼친 본문은 ref 줄보다 한 단계 들여써서 범위가 보이게 (context 조립 시 중복 제거에 씀)
+        return f"ref: {_ref_name(ref)}" + (f"\n{_indent(body, 2)}" if body else "")
 
     t = schema.get("type")
     desc = schema.get("description", "") or ""
@@ -33,134 +94,225 @@ def _summarize_schema(schema: Dict[str, Any], depth: int = 0, max_depth: int = 2
     if depth >= max_depth:
         return " | ".join(lines).strip()
 
+    for key in ("allOf", "oneOf", "anyOf"):
+        parts = schema.get(key)
+        if isinstance(parts, list) and parts:
+            lines.append(f"{key}:")
+            for part in parts[:10]:
+                lines.append(_indent(_summarize_schema(part, depth + 1, max_depth, resolver), 2))
+
     if t == "object":
         props = schema.get("properties", {}) or {}
         req = set(schema.get("required", []) or [])
         if props:
             lines.append("fields:")
             for k, v in list(props.items())[:40]:
-                vt = v.get("type") or ("ref" if "$ref" in v else "")
+                if not isinstance(v, dict):
+                    continue
+                if "$ref" in v:
+                    vt = _ref_name(str(v["$ref"])) if resolver is not None else "ref"
+                else:
+                    vt = v.get("type") or ""
+                    items = v.get("items")
+                    if resolver is not None and vt == "array" and isinstance(items, dict) and "$ref" in items:
+                        vt = f"array[{_ref_name(str(items['$ref']))}]"
                 vd = v.get("description", "") or ""
                 star = " (required)" if k in req else ""
                 lines.append(f"- {k}: {vt}{star} {vd}".strip())
 
     if t == "array":
         items = schema.get("items", {}) or {}
-        lines.append(f"items: {_summarize_schema(items, depth+1, max_depth)}")
+        lines.append(f"items: {_summarize_schema(items, depth+1, max_depth, resolver)}")
 
     return "\n".join(lines).strip()
 
-def make_docs_from_openapi(
-    spec: Dict[str, Any],
+def _operation_doc(
+    path: str, method: str, op: Dict[str, Any], max_text_chars: int, resolver: RefResolver
+) -> Doc:
+    m = method.upper()
+    summary = op.get("summary", "") or ""
+    desc = op.get("description", "") or ""
+    tags = op.get("tags", []) or []
+    operation_id = op.get("operationId", "") or ""
+
+    # parameters
+    params = op.get("parameters", []) or []
+    p_lines: List[str] = []
+    for p in params[:60]:
+        p = resolver.resolve(p)
+        if not isinstance(p, dict):
+            continue
+        name = p.get("name", "")
+        where = p.get("in", "")
+        required = bool(p.get("required", False))
+        pdesc = p.get("description", "") or ""
+        schema = p.get("schema", {}) or {}
+        ptype = schema.get("type", "") or (_ref_name(str(schema["$ref"])) if "$ref" in schema else "")
+        p_lines.append(f"- {name} ({where}) type={ptype} required={required} {pdesc}".strip())
+
+    # requestBody
+    rb = resolver.resolve(op.get("requestBody", {}) or {})
+    rb_desc = rb.get("description", "") or ""
+    rb_content = rb.get("content", {}) or {}
+    rb_schema_txt = ""
+    if isinstance(rb_content, dict) and rb_content:
+        ct = "application/json" if "application/json" in rb_content else next(iter(rb_content.keys()))
+        if isinstance(rb_content.get(ct), dict):
+            rb_schema = (rb_content[ct].get("schema", {}) or {})
+            rb_schema_txt = _summarize_schema(rb_schema, resolver=resolver)
+
+    # responses
+    resp = op.get("responses", {}) or {}
+    r_lines: List[str] = []
+    if isinstance(resp, dict):
+        for code, rv in list(resp.items())[:30]:
+            rv = resolver.resolve(rv)
+            if not isinstance(rv, dict):
+                continue
+            rdesc = rv.get("description", "") or ""
+            rcontent = rv.get("content", {}) or {}
+            rschema_txt = ""
+            if isinstance(rcontent, dict) and rcontent:
+                ct = "application/json" if "application/json" in rcontent else next(iter(rcontent.keys()))
+                if isinstance(rcontent.get(ct), dict):
+                    rschema = (rcontent[ct].get("schema", {}) or {})
+                    rschema_txt = _summarize_schema(rschema, resolver=resolver)
+
+            block = f"- {code}: {rdesc}".strip()
+            if rschema_txt:
+                block += f"\n  schema:\n{_indent(rschema_txt, 4)}"
+            r_lines.append(block)
+
+    title = f"{m} {path}"
+    parts = [
+        f"[ENDPOINT] {m} {path}",
+        f"summary: {summary}" if summary else "",
+        f"description:\n{desc}" if desc else "",
+        f"tags: {', '.join(tags)}" if tags else "",
+        f"operationId: {operation_id}" if operation_id else "",
+        "parameters:\n" + "\n".join(p_lines) if p_lines else "",
+        "requestBody:\n" + (rb_desc + "\n" if rb_desc else "") + rb_schema_txt if (rb_desc or rb_schema_txt) else "",
+        "responses:\n" + "\n".join(r_lines) if r_lines else "",
+    ]
+    text = _truncate("\n\n".join([x for x in parts if x]).strip(), max_text_chars)
+
+    doc_id = f"op::{m}::{path}::{operation_id or 'noid'}"
+    return Doc(
+        doc_id=doc_id,
+        kind="operation",
+        title=title,
+        text=text,
+        metadata={"method": m, "path": path, "tags": tags, "operationId": operation_id},
+    )
+
+def _schema_doc(name: str, schema: Dict[str, Any], max_text_chars: int, resolver: RefResolver) -> Doc:
+    ref = f"#/components/schemas/{name}"
+    # 오퍼레이션 문서에서 이미 만든 요약이 있으면 그대로 재사용
+    if resolver.lookup(ref) is schema:
+        body = resolver.schema_summary(ref)
+    else:
+        body = _summarize_schema(schema, resolver=resolver)
+    text = _truncate(f"[SCHEMA] {name}\n\n{body}".strip(), max_text_chars)
+    return Doc(
+        doc_id=f"schema::{name}",
+        kind="schema",
+        title=f"SCHEMA {name}",
+        text=text,
+        metadata={"schema": name},
+    )
+
+def _iter_operation_docs(
+    path_items: Iterable[Tuple[str, Any]], max_text_chars: int, resolver: RefResolver
+) -> Iterator[Doc]:
+    for path, item in path_items:
+        if not isinstance(item, dict):
+            continue
+        for method, op in item.items():
+            if method.lower() not in _HTTP_METHODS:
+                continue
+            if not isinstance(op, dict):
+                continue
+            yield _operation_doc(path, method, op, max_text_chars, resolver)
+
+# --- process pool 워커 (spawn으로 뜨므로 모듈 최상위 함수여야 함) ---
+_worker_resolver: Optional[RefResolver] = None
+
+def _init_worker(root: Dict[str, Any]) -> None:
+    global _worker_resolver
+    _worker_resolver = RefResolver(root)
+
+def _build_chunk(chunk: List[Tuple[str, Any]], max_text_chars: int) -> List[Doc]:
+    return list(_iter_operation_docs(chunk, max_text_chars, _worker_resolver or RefResolver({})))
+
+def _iter_operation_docs_parallel(
+    path_items: Iterator[Tuple[str, Any]], max_text_chars: int, resolver: RefResolver, workers: int, chunk_paths: int
+) -> Iterator[Doc]:
+    # paths를 chunk로 나눠 워커에 보내고, 제출 순서대로 결과를 내보냄 -> 직렬과 doc 순서/ID 동일
+    ctx = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(resolver.root,))
+    pending: Deque[Future] = deque()
+    try:
+        while True:
+            chunk = list(islice(path_items, chunk_paths))
+            if chunk:
+                pending.append(pool.submit(_build_chunk, chunk, max_text_chars))
+            # 메모리 제한: 워커 수의 2배까지만 미리 제출
+            while pending and (not chunk or len(pending) >= workers * 2):
+                yield from pending.popleft().result()
+            if not chunk:
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def iter_docs(
+    path_items: Iterable[Tuple[str, Any]],
+    schema_items: Iterable[Tuple[str, Any]],
     include_operations: bool,
     include_schemas: bool,
     max_text_chars: int,
-) -> List[Doc]:
-    docs: List[Doc] = []
-
+    resolver: Optional[RefResolver] = None,
+    workers: int = 0,
+    min_parallel_paths: int = PARSE_PARALLEL_MIN_PATHS,
+    chunk_paths: int = PARSE_CHUNK_PATHS,
+) -> Iterator[Doc]:
+    if resolver is None:
+        resolver = RefResolver({})
+    # paths / components.schemas 를 (key, value) 스트림으로 받아 문서를 하나씩 생성
     if include_operations:
-        paths = spec.get("paths", {}) or {}
-        for path, item in paths.items():
-            if not isinstance(item, dict):
-                continue
-            for method, op in item.items():
-                if method.lower() not in _HTTP_METHODS:
-                    continue
-                if not isinstance(op, dict):
-                    continue
-
-                m = method.upper()
-                summary = op.get("summary", "") or ""
-                desc = op.get("description", "") or ""
-                tags = op.get("tags", []) or []
-                operation_id = op.get("operationId", "") or ""
-
-                # parameters
-                params = op.get("parameters", []) or []
-                p_lines: List[str] = []
-                for p in params[:60]:
-                    if not isinstance(p, dict):
-                        continue
-                    name = p.get("name", "")
-                    where = p.get("in", "")
-                    required = bool(p.get("required", False))
-                    pdesc = p.get("description", "") or ""
-                    schema = p.get("schema", {}) or {}
-                    ptype = schema.get("type", "") or ("ref" if "$ref" in schema else "")
-                    p_lines.append(f"- {name} ({where}) type={ptype} required={required} {pdesc}".strip())
-
-                # requestBody
-                rb = op.get("requestBody", {}) or {}
-                rb_desc = rb.get("description", "") or ""
-                rb_content = rb.get("content", {}) or {}
-                rb_schema_txt = ""
-                if isinstance(rb_content, dict) and rb_content:
-                    ct = "application/json" if "application/json" in rb_content else next(iter(rb_content.keys()))
-                    if isinstance(rb_content.get(ct), dict):
-                        rb_schema = (rb_content[ct].get("schema", {}) or {})
-                        rb_schema_txt = _summarize_schema(rb_schema)
-
-                # responses
-                resp = op.get("responses", {}) or {}
-                r_lines: List[str] = []
-                if isinstance(resp, dict):
-                    for code, rv in list(resp.items())[:30]:
-                        if not isinstance(rv, dict):
-                            continue
-                        rdesc = rv.get("description", "") or ""
-                        rcontent = rv.get("content", {}) or {}
-                        rschema_txt = ""
-                        if isinstance(rcontent, dict) and rcontent:
-                            ct = "application/json" if "application/json" in rcontent else next(iter(rcontent.keys()))
-                            if isinstance(rcontent.get(ct), dict):
-                                rschema = (rcontent[ct].get("schema", {}) or {})
-                                rschema_txt = _summarize_schema(rschema)
-
-                        block = f"- {code}: {rdesc}".strip()
-                        if rschema_txt:
-                            block += f"\n  schema:\n{_indent(rschema_txt, 4)}"
-                        r_lines.append(block)
-
-                title = f"{m} {path}"
-                parts = [
-                    f"[ENDPOINT] {m} {path}",
-                    f"summary: {summary}" if summary else "",
-                    f"description:\n{desc}" if desc else "",
-                    f"tags: {', '.join(tags)}" if tags else "",
-                    f"operationId: {operation_id}" if operation_id else "",
-                    "parameters:\n" + "\n".join(p_lines) if p_lines else "",
-                    "requestBody:\n" + (rb_desc + "\n" if rb_desc else "") + rb_schema_txt if (rb_desc or rb_schema_txt) else "",
-                    "responses:\n" + "\n".join(r_lines) if r_lines else "",
-                ]
-                text = _truncate("\n\n".join([x for x in parts if x]).strip(), max_text_chars)
-
-                doc_id = f"op::{m}::{path}::{operation_id or 'noid'}"
-                docs.append(
-                    Doc(
-                        doc_id=doc_id,
-                        kind="operation",
-                        title=title,
-                        text=text,
-                        metadata={"method": m, "path": path, "tags": tags, "operationId": operation_id},
-                    )
-                )
+        it = iter(path_items)
+        workers = min(workers, os.cpu_count() or 1)
+        # 작은 스펙은 pool 시작 비용이 더 커서 직렬로
+        head = list(islice(it, min_parallel_paths)) if workers > 1 else []
+        if workers > 1 and len(head) >= min_parallel_paths:
+            yield from _iter_operation_docs_parallel(
+                chain(head, it), max_text_chars, resolver, workers, max(1, chunk_paths)
+            )
+        else:
+            yield from _iter_operation_docs(chain(head, it), max_text_chars, resolver)
 
     if include_schemas:
-        schemas = ((spec.get("components", {}) or {}).get("schemas", {}) or {})
-        if isinstance(schemas, dict):
-            for name, schema in schemas.items():
-                if not isinstance(schema, dict):
-                    continue
-                body = _summarize_schema(schema)
-                text = _truncate(f"[SCHEMA] {name}\n\n{body}".strip(), max_text_chars)
-                docs.append(
-                    Doc(
-                        doc_id=f"schema::{name}",
-                        kind="schema",
-                        title=f"SCHEMA {name}",
-                        text=text,
-                        metadata={"schema": name},
-                    )
-                )
-
-    return docs
+        for name, schema in schema_items:
+            if not isinstance(schema, dict):
+                continue
+            yield _schema_doc(name, schema, max_text_chars, resolver)
+
+def make_docs_from_openapi(
+    spec: Dict[str, Any],
+    include_operations: bool,
+    include_schemas: bool,
+    max_text_chars: int,
+    workers: int = 0,
+) -> List[Doc]:
+    paths = spec.get("paths", {}) or {}
+    schemas = ((spec.get("components", {}) or {}).get("schemas", {}) or {})
+    return list(
+        iter_docs(
+            paths.items() if isinstance(paths, dict) else [],
+            schemas.items() if isinstance(schemas, dict) else [],
+            include_operations,
+            include_schemas,
+            max_text_chars,
+            RefResolver(spec),
+            workers=workers,
+        )
+    )
@@ -0,0 +1,176 @@
+from __future__ import annotations
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import ijson
+import yaml
+from fastapi import HTTPException
+from yaml.constructor import SafeConstructor
+from yaml.events import (
+    AliasEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_MERGE_TAG = "tag:yaml.org,2002:merge"
+
+
+class _YamlBuilder:
+    # yaml 이벤트 스트림에서 필요한 노드만 파이썬 객체로 만듦 (나머지는 건너뜀)
+    def __init__(self, events: Iterator[Any]) -> None:
+        self.events = events
+        self.anchors: Dict[str, Any] = {}
+        self._resolver = Resolver()
+        self._constructor = SafeConstructor()
+
+    def _scalar(self, ev: ScalarEvent) -> Any:
+        tag = ev.tag
+        if tag is None or tag == "!":
+            tag = self._resolver.resolve(ScalarNode, ev.value, ev.implicit)
+        if tag == _MERGE_TAG:
+            return "<<"
+        fn = SafeConstructor.yaml_constructors.get(tag)
+        if fn is None:
+            return ev.value
+        # construct_object()는 노드별 캐시를 쌓아서 메모리가 커지므로 생성 함수를 직접 호출
+        return fn(self._constructor, ScalarNode(tag, ev.value, style=ev.style))
+
+    def build(self, ev: Any) -> Any:
+        if isinstance(ev, AliasEvent):
+            return self.anchors.get(ev.anchor)
+        if isinstance(ev, ScalarEvent):
+            value = self._scalar(ev)
+        elif isinstance(ev, SequenceStartEvent):
+            value = []
+            for item in self._until(SequenceEndEvent):
+                value.append(self.build(item))
+        elif isinstance(ev, MappingStartEvent):
+            value = {}
+            items = self._until(MappingEndEvent)
+            for k_ev in items:
+                k = self.build(k_ev)
+                v = self.build(next(items))
+                if k == "<<":
+                    for m in v if isinstance(v, list) else [v]:
+                        if isinstance(m, dict):
+                            for mk, mv in m.items():
+                                value.setdefault(mk, mv)
+                    continue
+                value[k] = v
+        else:
+            raise ValueError(f"unexpected yaml event: {ev}")
+        if getattr(ev, "anchor", None):
+            self.anchors[ev.anchor] = value
+        return value
+
+    def skip(self, ev: Any) -> None:
+        # anchor가 붙은 노드는 나중에 alias로 쓰일 수 있어서 만들어 둠
+        if getattr(ev, "anchor", None) and not isinstance(ev, AliasEvent):
+            self.build(ev)
+            return
+        if isinstance(ev, (SequenceStartEvent, MappingStartEvent)):
+            end = SequenceEndEvent if isinstance(ev, SequenceStartEvent) else MappingEndEvent
+            for item in self._until(end):
+                self.skip(item)
+
+    def _until(self, end_type: type) -> Iterator[Any]:
+        for ev in self.events:
+            if isinstance(ev, end_type):
+                return
+            yield ev
+
+    def kvitems(self, prefix: Tuple[str, ...]) -> Iterator[Tuple[Any, Any]]:
+        # 루트 매핑부터 prefix 경로를 따라 내려가서 그 매핑의 (key, value)를 하나씩
+        for ev in self.events:
+            if isinstance(ev, MappingStartEvent):
+                yield from self._descend(prefix)
+                return
+
+    def top_value(self, key: str) -> Any:
+        # 루트 매핑에서 key 하나만 만들고 바로 멈춤 (info처럼 앞쪽에 있는 작은 값용)
+        for ev in self.events:
+            if isinstance(ev, MappingStartEvent):
+                items = self._until(MappingEndEvent)
+                for k_ev in items:
+                    k = self.build(k_ev)
+                    v_ev = next(items)
+                    if k == key:
+                        return self.build(v_ev)
+                    self.skip(v_ev)
+                return None
+        return None
+
+    def _descend(self, prefix: Tuple[str, ...]) -> Iterator[Tuple[Any, Any]]:
+        items = self._until(MappingEndEvent)
+        for k_ev in items:
+            k = self.build(k_ev)
+            v_ev = next(items)
+            if not prefix:
+                yield k, self.build(v_ev)
+            elif k == prefix[0] and isinstance(v_ev, MappingStartEvent):
+                yield from self._descend(prefix[1:])
+            else:
+                self.skip(v_ev)
+
+
+# 디스크에 내려받은 스펙 파일. paths / components.schemas 를 통째로 올리지 않고 하나씩 읽음
+class SpecSource:
+    def __init__(self, path: str, fmt: str) -> None:
+        self.path = path
+        self.fmt = fmt  # "json" | "yaml"
+        # 조건부 재요청용 응답 헤더
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+
+    def _kvitems(self, prefix: Tuple[str, ...]) -> Iterator[Tuple[Any, Any]]:
+        try:
+            with open(self.path, "rb") as f:
+                if self.fmt == "json":
+                    yield from ijson.kvitems(f, ".".join(prefix), use_float=True)
+                else:
+                    yield from _YamlBuilder(yaml.parse(f, Loader=_YamlLoader)).kvitems(prefix)
+        except (ijson.JSONError, yaml.YAMLError) as e:
+            raise HTTPException(400, f"OpenAPI 스펙 파싱 실패. (format={self.fmt}, error={str(e)[:180]})")
+
+    def path_items(self) -> Iterator[Tuple[Any, Any]]:
+        return self._kvitems(("paths",))
+
+    def schema_items(self) -> Iterator[Tuple[Any, Any]]:
+        return self._kvitems(("components", "schemas"))
+
+    def components(self) -> Dict[str, Any]:
+        # $ref 해석용. paths에 비해 작아서 통째로 올림
+        return {k: v for k, v in self._kvitems(("components",))}
+
+    def info(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "rb") as f:
+                if self.fmt == "json":
+                    info = next(ijson.items(f, "info", use_float=True), None)
+                else:
+                    info = _YamlBuilder(yaml.parse(f, Loader=_YamlLoader)).top_value("info")
+        except (ijson.JSONError, yaml.YAMLError) as e:
+            raise HTTPException(400, f"OpenAPI 스펙 파싱 실패. (format={self.fmt}, error={str(e)[:180]})")
+        return info if isinstance(info, dict) else {}
+
+    def close(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def detect_format(url: str, content_type: str, head: bytes) -> str:
+    ct = (content_type or "").lower()
+    u = url.lower().split("?", 1)[0]
+    if "yaml" in ct or u.endswith(".yaml") or u.endswith(".yml"):
+        return "yaml"
+    if "json" in ct or u.endswith(".json"):
+        return "json"
+    return "json" if head.lstrip()[:1] in (b"{", b"[") else "yaml"
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import OPENAI_CHAT_MODEL
+from core.llm import build_context, call_chat
+
+# operation 문서별 "이 엔드포인트 설명" 답변을 ingest 때 미리 만들어 문서 옆(answer / answer_hash)에 저장
+# 질문 결과가 operation 하나로 뚜렷하게 모이면 /chat 은 LLM 호출 없이 이 답변을 돌려줌
+# 프롬프트를 바꾸면 _PROMPT_VERSION을 올려서 전부 다시 생성되게
+_PROMPT_VERSION = 1
+
+
+def answer_key(doc: Dict[str, Any]) -> str:
+    # 문서 내용(content_hash) + chat 모델 + 프롬프트가 같으면 같은 값 -> 바뀐 문서만 다시 생성
+    payload = json.dumps([OPENAI_CHAT_MODEL, _PROMPT_VERSION, doc.get("content_hash", "")])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def needs_answer(doc: Dict[str, Any]) -> bool:
+    return doc.get("kind") == "operation" and doc.get("answer_hash") != answer_key(doc)
+
+
+def canonical_query(doc: Dict[str, Any]) -> str:
+    meta = doc.get("metadata") or {}
+    target = f"{meta.get('method', '')} {meta.get('path', '')}".strip() or str(doc.get("title") or "")
+    return f"{target} 엔드포인트가 무엇을 하는지, 요청 파라미터/바디와 응답을 설명해줘"
+
+
+async def generate_answer(doc: Dict[str, Any]) -> str:
+    # /chat 과 같은 프롬프트 (curl 예시 + 파라미터 표) 에 문서 하나만 context로
+    context, _ = build_context([(doc, 1.0)])
+    return await call_chat(canonical_query(doc), context)
+
+
+def dominant_operation(
+    results: List[Tuple[Dict[str, Any], float]], threshold: float, margin: float
+) -> Optional[Dict[str, Any]]:
+    # 코사인 1등이 operation이고 threshold 이상, 2등과 margin 이상 차이 나면 그 문서
+    # (하이브리드 융합 후에는 순서가 점수순이 아닐 수 있어 다시 정렬)
+    if not results:
+        return None
+    ranked = sorted(results, key=lambda x: -x[1])
+    doc, top = ranked[0]
+    if doc.get("kind") != "operation" or top < threshold:
+        return None
+    if len(ranked) > 1 and top - ranked[1][1] < margin:
+        return None
+    return doc
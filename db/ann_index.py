@@ -0,0 +1,189 @@
+from __future__ import annotations
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_CENTROIDS_FILE = "ann_centroids.npy"
+_ASSIGN_FILE = "ann_assign.npy"
+_CODES_FILE = "ann_codes.npy"
+_META_FILE = "ann_meta.json"
+ANN_FILES = (_CENTROIDS_FILE, _ASSIGN_FILE, _CODES_FILE, _META_FILE)
+
+_CHUNK = 4096
+_TRAIN_ITERS = 10
+_SAMPLE_PER_LIST = 64
+
+
+def _atomic_save(path: str, arr: np.ndarray) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _encode(vecs: np.ndarray) -> np.ndarray:
+    # L2 정규화 벡터라 성분이 [-1, 1] -> 127배 후 반올림 (mongo int8 저장과 같은 방식)
+    return np.clip(np.rint(np.asarray(vecs, dtype=np.float32) * 127.0), -127, 127).astype(np.int8)
+
+
+def _nearest(vecs: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # 코사인 기준 가장 가까운 centroid (메모리 때문에 행 묶음 단위로)
+    out = np.empty(vecs.shape[0], dtype=np.int32)
+    for i in range(0, vecs.shape[0], _CHUNK):
+        block = np.asarray(vecs[i : i + _CHUNK], dtype=np.float32)
+        out[i : i + _CHUNK] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+
+def _kmeans(sample: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    # spherical k-means: 평균을 다시 정규화해서 centroid로
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(_TRAIN_ITERS):
+        assign = _nearest(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        centroids[nonempty] = _normalize(sums)
+        # 빈 리스트는 임의의 점으로 다시 시작
+        empty = np.flatnonzero(~nonempty)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    # 역색인(IVF) + int8 코드 + float 재정렬
+    # - 학습: 표본으로 spherical k-means -> nlist ~ sqrt(N) 개 리스트
+    # - 검색: 질문과 가까운 nprobe개 리스트의 후보를 int8 코드로 근사 점수 -> 상위 k*rerank 개만 원본 float 벡터로 다시 계산
+    # - 행 추가/변경은 가장 가까운 리스트에 배정만 (재학습 없음), 삭제는 남길 행만 골라냄
+    # - 불변 객체: 바꿀 때마다 새 인덱스를 돌려줘서 검색 중인 쪽은 이전 스냅샷을 그대로 씀
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray, codes: np.ndarray, trained_n: int) -> None:
+        self.centroids = centroids
+        self.assign = assign
+        self.codes = codes
+        self.trained_n = trained_n
+        self._order = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=centroids.shape[0])
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def __len__(self) -> int:
+        return int(self.assign.shape[0])
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.centroids.shape[1])
+
+    @classmethod
+    def train(cls, vecs: np.ndarray, seed: int = 0) -> "IVFIndex":
+        n = vecs.shape[0]
+        nlist = int(min(max(8, round(math.sqrt(n))), 4096, n))
+        rng = np.random.default_rng(seed)
+        take = np.sort(rng.choice(n, min(n, nlist * _SAMPLE_PER_LIST), replace=False))
+        sample = np.asarray(vecs[take], dtype=np.float32)
+        centroids = _kmeans(sample, nlist, rng)
+        assign = _nearest(vecs, centroids)
+        codes = np.empty(vecs.shape, dtype=np.int8)
+        for i in range(0, n, _CHUNK):
+            codes[i : i + _CHUNK] = _encode(vecs[i : i + _CHUNK])
+        return cls(centroids, assign, codes, n)
+
+    def needs_retrain(self, n: int) -> bool:
+        # 학습 때보다 4배 이상 커지거나 작아지면 리스트 크기가 치우쳐서 다시 학습
+        return n > self.trained_n * 4 or n * 4 < self.trained_n
+
+    def update(self, vecs: np.ndarray, rows: np.ndarray) -> "IVFIndex":
+        # rows: 새로 추가되었거나 벡터가 바뀐 행 번호 (vecs 기준, len(vecs) >= len(self))
+        n, old = vecs.shape[0], len(self)
+        assign = np.empty(n, dtype=np.int32)
+        assign[:old] = self.assign
+        codes = np.empty((n, self.dim), dtype=np.int8)
+        codes[:old] = self.codes
+        if rows.size:
+            sub = np.asarray(vecs[rows], dtype=np.float32)
+            assign[rows] = _nearest(sub, self.centroids)
+            codes[rows] = _encode(sub)
+        return IVFIndex(self.centroids, assign, codes, self.trained_n)
+
+    def take(self, keep: np.ndarray) -> "IVFIndex":
+        return IVFIndex(self.centroids, self.assign[keep], np.asarray(self.codes[keep]), self.trained_n)
+
+    def search(
+        self,
+        vecs: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        nprobe: int,
+        rerank: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # 질문별 (행 번호, 점수) 상위 k. mask가 있으면 True인 행만 (namespace 필터)
+        nprobe = max(1, min(nprobe, self.nlist))
+        cscores = queries @ self.centroids.T
+        out: List[Tuple[np.ndarray, np.ndarray]] = []
+        for q, cs in zip(queries, cscores):
+            probe = np.argpartition(-cs, nprobe - 1)[:nprobe]
+            cand = np.concatenate([self._order[self._offsets[c] : self._offsets[c + 1]] for c in probe])
+            if mask is not None:
+                cand = cand[mask[cand]]
+            if cand.size == 0:
+                out.append((cand, np.empty(0, dtype=np.float32)))
+                continue
+            approx = self.codes[cand].astype(np.float32) @ q
+            short = min(cand.size, max(k, k * rerank))
+            rows = np.sort(cand[np.argpartition(-approx, short - 1)[:short]])
+            exact = np.asarray(vecs[rows], dtype=np.float32) @ q
+            top = np.argsort(-exact)[:k]
+            out.append((rows[top], exact[top]))
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        return {"type": "ivf-int8", "nlist": self.nlist, "rows": len(self), "trained_n": self.trained_n}
+
+    def save(self, root: str) -> None:
+        _atomic_save(os.path.join(root, _CENTROIDS_FILE), self.centroids)
+        _atomic_save(os.path.join(root, _ASSIGN_FILE), self.assign)
+        _atomic_save(os.path.join(root, _CODES_FILE), np.ascontiguousarray(self.codes))
+        meta_path = os.path.join(root, _META_FILE)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.info(), f, indent=2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, root: str, count: int, dim: int) -> Optional["IVFIndex"]:
+        # 저장소와 행 수/차원이 안 맞으면 (중간에 죽었거나 이전 버전) None -> 다시 학습
+        meta_path = os.path.join(root, _META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            centroids = np.load(os.path.join(root, _CENTROIDS_FILE))
+            assign = np.load(os.path.join(root, _ASSIGN_FILE))
+            codes = np.load(os.path.join(root, _CODES_FILE), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if assign.shape[0] != count or codes.shape != (count, dim) or centroids.shape[1] != dim:
+            return None
+        return cls(centroids, assign, codes, int(meta.get("trained_n", count)))
+
+    @staticmethod
+    def remove(root: str) -> None:
+        for name in ANN_FILES:
+            path = os.path.join(root, name)
+            if os.path.exists(path):
+                os.remove(path)
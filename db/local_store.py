@@ -0,0 +1,342 @@
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from core.config import LOCAL_STORE_DIR, DEFAULT_NAMESPACE, ANN_INDEX, ANN_MIN_ROWS, ANN_NPROBE, ANN_RERANK
+from db.ann_index import IVFIndex
+
+_VEC_FILE = "embeddings.npy"
+_DOCS_FILE = "docs.jsonl"
+_META_FILE = "store_meta.json"
+
+
+def _ns(d: Dict[str, Any]) -> str:
+    # namespace 도입 전에 저장된 문서는 기본 namespace로 취급
+    return d.get("namespace") or DEFAULT_NAMESPACE
+
+
+def _key(d: Dict[str, Any]) -> Tuple[str, str]:
+    return _ns(d), d["doc_id"]
+
+
+def _atomic_write(path: str, write) -> None:
+    # 같은 디렉터리에 임시파일로 쓰고 os.replace -> 중간에 죽어도 이전 파일이 남음
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# MongoVectorStore와 같은 인터페이스의 로컬 저장소
+# - 벡터: float32 행렬(embeddings.npy, mmap) / 문서: docs.jsonl / 차원·개수: store_meta.json
+# - 벡터는 L2 정규화되어 들어오므로 내적 = 코사인 유사도
+# - 문서 식별자는 (namespace, doc_id), 검색은 namespace별 행 번호로 걸러서 해당 행만 계산
+# - 문서가 ANN_MIN_ROWS 이상이면 IVF 인덱스(ann_*.npy)로 후보만 계산하고 원본 벡터로 재정렬
+class LocalVectorStore:
+    # 번들 import는 한 번에 (upsert마다 파일 전체를 다시 쓰므로 나눠 넣으면 느려짐)
+    IMPORT_BATCH = 0
+
+    def __init__(self, root: str = LOCAL_STORE_DIR) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._docs: List[Dict[str, Any]] = []
+        self._index: Dict[Tuple[str, str], int] = {}
+        self._ns_rows: Dict[str, np.ndarray] = {}
+        self._vecs: Optional[np.ndarray] = None
+        self._ann: Optional[IVFIndex] = None
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load(self) -> None:
+        meta_path = self._path(_META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        count = int(meta.get("count", 0))
+        if count == 0:
+            return
+
+        vecs = np.load(self._path(_VEC_FILE), mmap_mode="r")
+        docs: List[Dict[str, Any]] = []
+        with open(self._path(_DOCS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    docs.append(json.loads(line))
+
+        if vecs.ndim != 2 or vecs.shape[0] != count or len(docs) != count:
+            raise HTTPException(
+                500,
+                f"로컬 벡터 저장소가 손상되었습니다. (meta={count}, vecs={vecs.shape}, docs={len(docs)})",
+            )
+
+        self._vecs = vecs
+        self._set_docs(docs)
+        if ANN_INDEX == "ivf" and count >= ANN_MIN_ROWS:
+            self._ann = IVFIndex.load(self.root, count, int(vecs.shape[1]))
+            if self._ann is None:
+                # 인덱스 파일이 없거나 저장소와 안 맞으면 새로 학습
+                self._ann = IVFIndex.train(vecs)
+                self._ann.save(self.root)
+
+    def _set_docs(self, docs: List[Dict[str, Any]]) -> None:
+        rows: Dict[str, List[int]] = {}
+        for i, d in enumerate(docs):
+            rows.setdefault(_ns(d), []).append(i)
+        self._docs = docs
+        self._index = {_key(d): i for i, d in enumerate(docs)}
+        self._ns_rows = {ns: np.array(r, dtype=np.int64) for ns, r in rows.items()}
+
+    def _write_docs(self, docs: List[Dict[str, Any]]) -> None:
+        _atomic_write(
+            self._path(_DOCS_FILE),
+            lambda f: f.write("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in docs).encode("utf-8")),
+        )
+
+    def _next_ann(
+        self, vecs: Optional[np.ndarray], rows: Optional[np.ndarray] = None, keep: Optional[np.ndarray] = None
+    ) -> Optional[IVFIndex]:
+        # rows: 추가/변경된 행, keep: 삭제 후 남은 (이전) 행 번호
+        n = vecs.shape[0] if vecs is not None else 0
+        if ANN_INDEX != "ivf" or n < ANN_MIN_ROWS:
+            return None
+        ann = self._ann
+        if ann is not None and ann.dim == vecs.shape[1]:
+            if keep is not None:
+                ann = ann.take(keep)
+            elif rows is not None and len(ann) <= n:
+                ann = ann.update(vecs, rows)
+        if ann is None or len(ann) != n or ann.dim != vecs.shape[1] or ann.needs_retrain(n):
+            ann = IVFIndex.train(vecs)
+        return ann
+
+    def _persist(
+        self, docs: List[Dict[str, Any]], vecs: Optional[np.ndarray], ann: Optional[IVFIndex] = None
+    ) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        count = len(docs)
+        dim = int(vecs.shape[1]) if vecs is not None and count else 0
+
+        if count:
+            _atomic_write(self._path(_VEC_FILE), lambda f: np.save(f, np.ascontiguousarray(vecs, dtype=np.float32)))
+            self._write_docs(docs)
+        if ann is not None:
+            ann.save(self.root)
+        else:
+            IVFIndex.remove(self.root)
+        # meta는 마지막에 교체 (count가 맞지 않으면 _load에서 감지)
+        _atomic_write(
+            self._path(_META_FILE),
+            lambda f: f.write(json.dumps({"dim": dim, "count": count}, indent=2).encode("utf-8")),
+        )
+
+        self._set_docs(docs)
+        self._vecs = np.load(self._path(_VEC_FILE), mmap_mode="r") if count else None
+        # 코드 행렬도 mmap으로 다시 열어 메모리에 두 벌 들고 있지 않게
+        self._ann = IVFIndex.load(self.root, count, dim) if ann is not None else None
+
+    def reset(self, namespace: Optional[str] = None) -> int:
+        if namespace is not None:
+            return self._delete_where(lambda d: _ns(d) == namespace)
+        with self._lock:
+            deleted = len(self._docs)
+            self._persist([], None)
+            return deleted
+
+    def count(self, namespaces: Optional[List[str]] = None) -> int:
+        if namespaces is None:
+            return len(self._docs)
+        return sum(len(self._ns_rows.get(ns, ())) for ns in namespaces)
+
+    # 로컬 저장소는 in-process라 async 버전은 그대로 위임
+    async def acount(self, namespaces: Optional[List[str]] = None) -> int:
+        return self.count(namespaces)
+
+    def namespaces(self) -> Dict[str, int]:
+        return {ns: len(r) for ns, r in sorted(self._ns_rows.items())}
+
+    async def aclose(self) -> None:
+        return None
+
+    def all_docs(self) -> List[Dict[str, Any]]:
+        return list(self._docs)
+
+    def export_rows(
+        self, namespaces: Optional[List[str]] = None, batch: int = 4096
+    ) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        vecs, docs, ns_rows = self._vecs, self._docs, self._ns_rows
+        if vecs is None or not docs:
+            return
+        if namespaces is None:
+            rows = np.arange(len(docs))
+        else:
+            parts = [ns_rows[ns] for ns in namespaces if ns in ns_rows]
+            if not parts:
+                return
+            rows = np.concatenate(parts)
+        for i in range(0, rows.size, batch):
+            r = rows[i : i + batch]
+            yield [dict(docs[j]) for j in r], np.asarray(vecs[r], dtype=np.float32)
+
+    def doc_hashes(self, namespace: str) -> Dict[str, str]:
+        return {d["doc_id"]: d.get("content_hash", "") for d in self._docs if _ns(d) == namespace}
+
+    def operation_docs(self, namespace: str) -> List[Dict[str, Any]]:
+        return [
+            {k: v for k, v in d.items() if k != "answer"}
+            for d in self._docs
+            if _ns(d) == namespace and d.get("kind") == "operation"
+        ]
+
+    def set_answers(self, namespace: str, answers: List[Dict[str, Any]]) -> int:
+        # answers: {doc_id, content_hash, answer, answer_hash}. 그 사이 문서가 바뀌었으면(content_hash 다름) 버림
+        # 벡터/행 순서는 그대로라 docs.jsonl만 다시 씀
+        if not answers:
+            return 0
+        with self._lock:
+            docs = list(self._docs)
+            n = 0
+            for a in answers:
+                i = self._index.get((namespace, a["doc_id"]))
+                if i is None or docs[i].get("content_hash") != a["content_hash"]:
+                    continue
+                docs[i] = {**docs[i], "answer": a["answer"], "answer_hash": a["answer_hash"]}
+                n += 1
+            if n:
+                self._write_docs(docs)
+                self._set_docs(docs)
+            return n
+
+    async def aget_answer(self, doc: Dict[str, Any]) -> Optional[str]:
+        # 검색 결과 문서에 이미 들어 있음
+        return doc.get("answer")
+
+    def delete_docs(self, namespace: str, doc_ids: List[str]) -> int:
+        if not doc_ids:
+            return 0
+        drop = set(doc_ids)
+        return self._delete_where(lambda d: _ns(d) == namespace and d["doc_id"] in drop)
+
+    def _delete_where(self, pred) -> int:
+        with self._lock:
+            keep = [i for i, d in enumerate(self._docs) if not pred(d)]
+            deleted = len(self._docs) - len(keep)
+            if deleted == 0:
+                return 0
+            docs = [self._docs[i] for i in keep]
+            vecs = np.array(self._vecs[keep], dtype=np.float32) if keep else None
+            self._persist(docs, vecs, self._next_ann(vecs, keep=np.array(keep, dtype=np.int64)))
+            return deleted
+
+    def upsert_docs(self, docs: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        if not docs:
+            return
+        emb = np.asarray(embeddings, dtype=np.float32)
+
+        with self._lock:
+            if self._vecs is not None and self._vecs.shape[1] != emb.shape[1]:
+                raise HTTPException(
+                    500,
+                    f"임베딩 차원이 저장소와 다릅니다. (store={self._vecs.shape[1]}, new={emb.shape[1]}) /reset 후 다시 인덱싱하세요.",
+                )
+
+            new_docs = list(self._docs)
+            index = dict(self._index)
+            base = np.array(self._vecs, dtype=np.float32) if self._vecs is not None else np.empty((0, emb.shape[1]), np.float32)
+
+            appended: List[np.ndarray] = []
+            replaced: List[int] = []
+            for d, v in zip(docs, emb):
+                i = index.get(_key(d))
+                if i is None:
+                    index[_key(d)] = len(new_docs)
+                    new_docs.append(dict(d))
+                    appended.append(v)
+                elif i < base.shape[0]:
+                    new_docs[i] = dict(d)
+                    base[i] = v
+                    replaced.append(i)
+                else:
+                    # 같은 배치 안에서 중복된 doc_id
+                    new_docs[i] = dict(d)
+                    appended[i - base.shape[0]] = v
+
+            vecs = np.vstack([base, np.stack(appended)]) if appended else base
+            rows = np.concatenate([np.array(replaced, dtype=np.int64), np.arange(base.shape[0], vecs.shape[0])])
+            self._persist(new_docs, vecs, self._next_ann(vecs, rows=rows))
+
+    def search(
+        self, query_vec: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        return self.search_many(np.asarray(query_vec, dtype=np.float32).reshape(1, -1), k, namespaces)[0]
+
+    def search_many(
+        self, query_vecs: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        # 질문 여러 개를 행렬곱 한 번으로 (n_docs x dim) @ (dim x n_queries)
+        # IVF 인덱스가 있으면 후보 리스트만 근사 계산 후 재정렬
+        vecs, docs, ns_rows, ann = self._vecs, self._docs, self._ns_rows, self._ann
+        q = np.asarray(query_vecs, dtype=np.float32)
+        if vecs is None or not docs or q.shape[0] == 0:
+            return [[] for _ in range(q.shape[0])]
+
+        if q.shape[1] != vecs.shape[1]:
+            raise HTTPException(
+                500,
+                f"질문 임베딩 차원이 저장소와 다릅니다. (store={vecs.shape[1]}, query={q.shape[1]}) "
+                "EMBED_BACKEND/모델을 바꿨다면 /reset 후 다시 인덱싱하세요.",
+            )
+        rows: Optional[np.ndarray] = None
+        if namespaces is not None:
+            parts = [ns_rows[ns] for ns in namespaces if ns in ns_rows]
+            if not parts:
+                return [[] for _ in range(q.shape[0])]
+            rows = np.concatenate(parts)
+
+        # 고른 namespace가 작으면 인덱스 없이 그 행만 전부 계산하는 쪽이 빠르고 정확
+        if ann is not None and len(ann) == vecs.shape[0] and (rows is None or rows.size >= ANN_MIN_ROWS):
+            mask = None
+            nprobe = ANN_NPROBE
+            if rows is not None:
+                mask = np.zeros(vecs.shape[0], dtype=bool)
+                mask[rows] = True
+                # 일부 namespace만 보면 리스트당 후보가 그만큼 줄어드니 더 많이 probe
+                nprobe = math.ceil(nprobe * vecs.shape[0] / rows.size)
+            found = ann.search(vecs, q, max(1, k), nprobe, ANN_RERANK, mask)
+            return [[(dict(docs[i]), float(s)) for i, s in zip(ids, sc)] for ids, sc in found]
+
+        scores = (vecs @ q.T).T if rows is None else (vecs[rows] @ q.T).T
+
+        k = min(max(1, k), scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out: List[List[Tuple[Dict[str, Any], float]]] = []
+        for row_scores, row_top in zip(scores, top):
+            row_top = row_top[np.argsort(-row_scores[row_top])]
+            ids = row_top if rows is None else rows[row_top]
+            out.append([(dict(docs[i]), float(s)) for i, s in zip(ids, row_scores[row_top])])
+        return out
+
+    # 로컬은 본문이 메모리에 있어 검색 결과에 이미 포함됨
+    async def ahydrate(self, results: List[Tuple[Dict[str, Any], float]]) -> List[Tuple[Dict[str, Any], float]]:
+        return results
+
+    async def asearch(
+        self, query_vec: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        return self.search(query_vec, k, namespaces)
+
+    async def asearch_many(
+        self, query_vecs: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        return self.search_many(query_vecs, k, namespaces)
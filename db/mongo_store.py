@@ -1,90 +1,294 @@
 from __future__ import annotations
+import asyncio
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 
 import numpy as np
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
-from pymongo import MongoClient, UpdateOne
+from pymongo import AsyncMongoClient, MongoClient, UpdateOne
 from pymongo.errors import PyMongoError
 
-from core.config import MONGODB_URI, MONGODB_DB, MONGODB_COL, VECTOR_INDEX
+from core.config import (
+    MONGODB_URI,
+    MONGODB_DB,
+    MONGODB_COL,
+    VECTOR_INDEX,
+    MONGO_VECTOR_DTYPE,
+    MONGO_WRITE_CHUNK_BYTES,
+    MONGO_WRITE_CONCURRENCY,
+    MONGO_SEARCH_CONCURRENCY,
+)
+
+# 검색 결과에는 본문(text)을 빼고, LLM에 넘길 때만 hydrate()로 채움
+_RESULT_FIELDS = ("namespace", "spec_version", "doc_id", "kind", "title", "metadata", "content_hash", "answer_hash")
+_BULK_MAX_OPS = 1000
 
 def _utc_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
+def encode_vector(vec: np.ndarray, dtype: str = MONGO_VECTOR_DTYPE) -> Any:
+    # BSON binary vector: [dtype 1byte][padding 1byte][little-endian 값들] (Binary.from_vector 와 같은 형식)
+    # 리스트를 거치지 않고 numpy 버퍼를 그대로 씀
+    v = np.asarray(vec, dtype=np.float32).reshape(-1)
+    if dtype == "array":
+        return v.astype(float).tolist()
+    if dtype == "int8":
+        # L2 정규화 벡터라 성분이 [-1, 1] -> 127배 후 반올림 (코사인은 스케일에 무관)
+        q = np.clip(np.rint(v * 127.0), -127, 127).astype(np.int8)
+        return Binary(BinaryVectorDtype.INT8.value + b"\x00" + q.tobytes(), VECTOR_SUBTYPE)
+    if dtype == "float32":
+        return Binary(BinaryVectorDtype.FLOAT32.value + b"\x00" + v.astype("<f4").tobytes(), VECTOR_SUBTYPE)
+    raise HTTPException(500, f"MONGO_VECTOR_DTYPE 값이 잘못되었습니다. (float32 | int8 | array, got={dtype})")
+
+def decode_vector(value: Any) -> np.ndarray:
+    # encode_vector 의 역변환 (번들 export용). int8은 127로 나눈 뒤 다시 정규화
+    if isinstance(value, bytes):
+        raw = bytes(value)
+        if raw[:1] == BinaryVectorDtype.INT8.value:
+            v = np.frombuffer(raw[2:], dtype=np.int8).astype(np.float32) / 127.0
+            return v / max(float(np.linalg.norm(v)), 1e-12)
+        return np.frombuffer(raw[2:], dtype="<f4").astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+def _chunks(ops: List[Tuple[UpdateOne, int]], max_bytes: int) -> List[List[UpdateOne]]:
+    # 요청 크기(대략)와 개수 기준으로 나눔
+    out: List[List[UpdateOne]] = []
+    cur: List[UpdateOne] = []
+    size = 0
+    for op, n in ops:
+        if cur and (size + n > max_bytes or len(cur) >= _BULK_MAX_OPS):
+            out.append(cur)
+            cur, size = [], 0
+        cur.append(op)
+        size += n
+    if cur:
+        out.append(cur)
+    return out
+
+def _ns_filter(namespaces: Optional[List[str]]) -> Dict[str, Any]:
+    return {} if namespaces is None else {"namespace": {"$in": list(namespaces)}}
+
 class MongoVectorStore:
+    # 번들 import 시 upsert_docs 1회에 넘길 문서 수 (요청 크기는 upsert_docs 안에서 다시 나눔)
+    IMPORT_BATCH = 2000
+
     def __init__(self) -> None:
         self._client: Optional[MongoClient] = None
+        # /chat 경로(count/search)는 이벤트 루프를 막지 않도록 async 드라이버 사용
+        self._aclient: Optional[AsyncMongoClient] = None
 
-    def _col(self):
+    def _check_env(self) -> None:
         if not (MONGODB_URI and MONGODB_DB and MONGODB_COL):
             raise HTTPException(500, "Mongo 환경변수(MONGODB_URI/DB/COL)가 설정되지 않았습니다.")
+
+    def _col(self):
+        self._check_env()
         if self._client is None:
             self._client = MongoClient(MONGODB_URI)
         return self._client[MONGODB_DB][MONGODB_COL]
 
-    def reset(self) -> int:
-        res = self._col().delete_many({})
+    def _acol(self):
+        self._check_env()
+        if self._aclient is None:
+            self._aclient = AsyncMongoClient(MONGODB_URI)
+        return self._aclient[MONGODB_DB][MONGODB_COL]
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.close()
+            self._aclient = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def reset(self, namespace: Optional[str] = None) -> int:
+        res = self._col().delete_many({} if namespace is None else {"namespace": namespace})
         return int(res.deleted_count)
 
-    def count(self) -> int:
-        return int(self._col().count_documents({}))
+    def count(self, namespaces: Optional[List[str]] = None) -> int:
+        return int(self._col().count_documents(_ns_filter(namespaces)))
+
+    async def acount(self, namespaces: Optional[List[str]] = None) -> int:
+        return int(await self._acol().count_documents(_ns_filter(namespaces)))
+
+    def namespaces(self) -> Dict[str, int]:
+        rows = self._col().aggregate([{"$group": {"_id": "$namespace", "n": {"$sum": 1}}}, {"$sort": {"_id": 1}}])
+        return {str(r["_id"]): int(r["n"]) for r in rows if r["_id"] is not None}
+
+    def all_docs(self) -> List[Dict[str, Any]]:
+        return list(self._col().find({}, {"_id": 0, "embedding": 0, "answer": 0}))
+
+    def export_rows(
+        self, namespaces: Optional[List[str]] = None, batch: int = 1000
+    ) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        # (문서들, float32 벡터 행렬) 묶음 단위로
+        cur = self._col().find(_ns_filter(namespaces), {"_id": 0, "created_at": 0, "updated_at": 0}).batch_size(batch)
+        docs: List[Dict[str, Any]] = []
+        vecs: List[np.ndarray] = []
+        for r in cur:
+            vecs.append(decode_vector(r.pop("embedding")))
+            docs.append(r)
+            if len(docs) >= batch:
+                yield docs, np.stack(vecs)
+                docs, vecs = [], []
+        if docs:
+            yield docs, np.stack(vecs)
+
+    def doc_hashes(self, namespace: str) -> Dict[str, str]:
+        cur = self._col().find({"namespace": namespace}, {"_id": 0, "doc_id": 1, "content_hash": 1})
+        return {r["doc_id"]: r.get("content_hash", "") for r in cur if "doc_id" in r}
+
+    def operation_docs(self, namespace: str) -> List[Dict[str, Any]]:
+        cur = self._col().find({"namespace": namespace, "kind": "operation"}, {"_id": 0, "embedding": 0, "answer": 0})
+        return list(cur)
+
+    def set_answers(self, namespace: str, answers: List[Dict[str, Any]]) -> int:
+        # 그 사이 문서가 바뀌었으면(content_hash 다름) 매칭되지 않아 버려짐
+        ops = [
+            UpdateOne(
+                {"namespace": namespace, "doc_id": a["doc_id"], "content_hash": a["content_hash"]},
+                {"$set": {"answer": a["answer"], "answer_hash": a["answer_hash"]}},
+            )
+            for a in answers
+        ]
+        if not ops:
+            return 0
+        return int(self._col().bulk_write(ops, ordered=False).modified_count)
+
+    async def aget_answer(self, doc: Dict[str, Any]) -> Optional[str]:
+        if "answer" in doc:
+            return doc["answer"]
+        query = {"namespace": doc.get("namespace"), "doc_id": doc.get("doc_id"), "answer_hash": doc.get("answer_hash")}
+        try:
+            row = await self._acol().find_one(query, {"_id": 0, "answer": 1})
+        except PyMongoError as e:
+            raise HTTPException(500, f"MongoDB 문서 조회 실패. (error={str(e)[:180]})")
+        return row.get("answer") if row else None
+
+    def delete_docs(self, namespace: str, doc_ids: List[str]) -> int:
+        if not doc_ids:
+            return 0
+        res = self._col().delete_many({"namespace": namespace, "doc_id": {"$in": list(doc_ids)}})
+        return int(res.deleted_count)
 
     def upsert_docs(self, docs: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
-        ops: List[UpdateOne] = []
+        now = _utc_iso()
+        ops: List[Tuple[UpdateOne, int]] = []
         for d, emb in zip(docs, embeddings):
-            ops.append(
-                UpdateOne(
-                    {"doc_id": d["doc_id"]},
-                    {
-                        "$set": {
-                            **d,
-                            "embedding": emb.astype(float).tolist(),
-                            "updated_at": _utc_iso(),
-                        },
-                        "$setOnInsert": {"created_at": _utc_iso()},
-                    },
-                    upsert=True,
-                )
+            vec = encode_vector(emb)
+            op = UpdateOne(
+                {"namespace": d["namespace"], "doc_id": d["doc_id"]},
+                {
+                    "$set": {**d, "embedding": vec, "updated_at": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True,
             )
-        if ops:
-            self._col().bulk_write(ops, ordered=False)
+            approx = len(vec) if isinstance(vec, Binary) else 9 * len(vec)
+            approx += len(d.get("text", "")) * 3 + 512
+            ops.append((op, approx))
+        if not ops:
+            return
+
+        col = self._col()
+        chunks = _chunks(ops, MONGO_WRITE_CHUNK_BYTES)
+        if len(chunks) == 1 or MONGO_WRITE_CONCURRENCY <= 1:
+            for c in chunks:
+                col.bulk_write(c, ordered=False)
+            return
+        # 서로 다른 문서라 순서 무관 -> 청크를 동시에 전송
+        with ThreadPoolExecutor(max_workers=min(MONGO_WRITE_CONCURRENCY, len(chunks))) as ex:
+            for f in [ex.submit(col.bulk_write, c, ordered=False) for c in chunks]:
+                f.result()
 
-    def search(self, query_vec: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+    def _search_pipeline(
+        self, query_vec: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         if not VECTOR_INDEX:
             raise HTTPException(500, "VECTOR_INDEX 환경변수가 설정되지 않았습니다.")
 
         k = max(1, k)
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": VECTOR_INDEX,
-                    "path": "embedding",
-                    "queryVector": query_vec[0].astype(float).tolist(),
-                    "numCandidates": max(100, k * 20),
-                    "limit": k,
-                }
-            },
+        vs: Dict[str, Any] = {
+            "index": VECTOR_INDEX,
+            "path": "embedding",
+            # 저장한 형식과 같은 형식으로 질의
+            "queryVector": encode_vector(query_vec[0]),
+            "numCandidates": max(100, k * 20),
+            "limit": k,
+        }
+        # pre-filter: 후보 탐색 단계에서 namespace로 거름 (인덱스에 filter 필드 필요)
+        if namespaces is not None:
+            vs["filter"] = _ns_filter(namespaces)
+        return [
+            {"$vectorSearch": vs},
             {
                 "$project": {
                     "_id": 0,
-                    "doc_id": 1,
-                    "kind": 1,
-                    "title": 1,
-                    "text": 1,
-                    "metadata": 1,
+                    **{f: 1 for f in _RESULT_FIELDS},
                     "score": {"$meta": "vectorSearchScore"},
                 }
             },
         ]
 
+    @staticmethod
+    def _search_error(e: PyMongoError) -> HTTPException:
+        return HTTPException(
+            500,
+            "MongoDB $vectorSearch 실패. Atlas Search Index 존재/차원(numDimensions)/namespace filter 필드 확인 필요. "
+            f"(error={str(e)[:180]})",
+        )
+
+    def search(
+        self, query_vec: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        pipeline = self._search_pipeline(query_vec, k, namespaces)
         try:
             rows = list(self._col().aggregate(pipeline))
         except PyMongoError as e:
-            raise HTTPException(
-                500,
-                "MongoDB $vectorSearch 실패. Atlas Search Index 존재/차원(numDimensions) 일치 확인 필요. "
-                f"(error={str(e)[:180]})",
-            )
+            raise self._search_error(e)
 
         return [(r, float(r.get("score", 0.0))) for r in rows]
+
+    async def asearch(
+        self, query_vec: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        pipeline = self._search_pipeline(query_vec, k, namespaces)
+        try:
+            cur = await self._acol().aggregate(pipeline)
+            rows = await cur.to_list(None)
+        except PyMongoError as e:
+            raise self._search_error(e)
+
+        return [(r, float(r.get("score", 0.0))) for r in rows]
+
+    async def asearch_many(
+        self, query_vecs: np.ndarray, k: int, namespaces: Optional[List[str]] = None
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        # $vectorSearch는 질문 하나씩이라 동시에 보내되 MONGO_SEARCH_CONCURRENCY개까지만
+        sem = asyncio.Semaphore(max(1, MONGO_SEARCH_CONCURRENCY))
+
+        async def one(qv: np.ndarray) -> List[Tuple[Dict[str, Any], float]]:
+            async with sem:
+                return await self.asearch(qv, k, namespaces)
+
+        return list(await asyncio.gather(*(one(qv) for qv in np.asarray(query_vecs, dtype=np.float32))))
+
+    async def ahydrate(self, results: List[Tuple[Dict[str, Any], float]]) -> List[Tuple[Dict[str, Any], float]]:
+        # 본문이 빠진 결과에만 text를 한 번에 채움
+        missing = [d for d, _ in results if "text" not in d]
+        if not missing:
+            return results
+        query = {"$or": [{"namespace": d.get("namespace"), "doc_id": d.get("doc_id")} for d in missing]}
+        try:
+            cur = self._acol().find(query, {"_id": 0, "namespace": 1, "doc_id": 1, "text": 1})
+            texts = {(r.get("namespace"), r.get("doc_id")): r.get("text", "") async for r in cur}
+        except PyMongoError as e:
+            raise HTTPException(500, f"MongoDB 문서 조회 실패. (error={str(e)[:180]})")
+        out: List[Tuple[Dict[str, Any], float]] = []
+        for d, s in results:
+            if "text" not in d:
+                d = {**d, "text": texts.get((d.get("namespace"), d.get("doc_id")), "")}
+            out.append((d, s))
+        return out
@@ -1,22 +1,164 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
-from schemas.ingest import IngestRequest, IngestResponse
-from schemas.chat import ChatRequest, ChatResponse
-from schemas.doc import Doc
+from schemas.ingest import IngestRequest, IngestResponse, IngestJobStatus
+from schemas.chat import ChatRequest, ChatResponse, ChatBatchRequest, ChatBatchResponse
 
-from core.config import DEFAULT_TOP_K, DEFAULT_THRESHOLD
+from core.config import (
+    DEFAULT_TOP_K,
+    DEFAULT_THRESHOLD,
+    VECTOR_STORE,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_MAX_DISTANCE,
+    LEXICAL_INDEX,
+    CHAT_BATCH_CONCURRENCY,
+    CHAT_EMBED_CONCURRENCY,
+    CHAT_SEARCH_CONCURRENCY,
+    CHAT_LLM_CONCURRENCY,
+    CHAT_QUEUE_MAX,
+    CHAT_COALESCE,
+    PRECOMPUTED_MARGIN,
+    EMBED_BACKEND,
+    OPENAI_CHAT_MODEL,
+)
 from core.embedder import Embedder
-from core.openapi_fetch import resolve_spec_url, fetch_json
-from core.openapi_parse import make_docs_from_openapi
-from core.llm import build_context, call_chat, make_fallback
+from core.embed_cache import normalize_text
+from core.llm import build_context, call_chat, count_tokens, llm_available, make_citations, make_fallback, prompt_tokens, stream_chat
+from core.jobs import IngestJobManager
+from core.answer_cache import SemanticAnswerCache
+from core.admission import Limiter, SingleFlight
+from core.precompute import answer_key, dominant_operation
+from core.bundle import extract_bundle, load_bundle, write_bundle
+from core.lexical import LexicalIndex, fuse
+from core.metrics import metrics, stage, record_stage, begin_request, end_request, server_timing
+from core import clients
+
+# 저장소/임베더/ingest 관리자는 처음 쓸 때 만듦 (import 시점에는 연결하지 않음)
+# 앱 시작 시 lifespan에서 warm-up으로 미리 만들고 연결까지 맺어 둠 -> 끝나면 /ready 가 200
+_store_lock, _embedder_lock, _jobs_lock = threading.Lock(), threading.Lock(), threading.Lock()
+_store: Any = None
+_embedder: Optional[Embedder] = None
+_jobs: Optional[IngestJobManager] = None
+_warmup: Dict[str, Any] = {"ready": False, "running": False, "errors": {}, "timings": {}}
+_warmup_task: Optional[asyncio.Task] = None
+
+
+def get_store() -> Any:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                # 안 쓰는 쪽 드라이버(pymongo 등)는 import하지 않음
+                if VECTOR_STORE == "local":
+                    from db.local_store import LocalVectorStore
+
+                    _store = LocalVectorStore()
+                else:
+                    from db.mongo_store import MongoVectorStore
+
+                    _store = MongoVectorStore()
+    return _store
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = Embedder()
+    return _embedder
 
-from db.mongo_store import MongoVectorStore
 
-app = FastAPI(title="Swagger Threshold Chatbot (Mongo Atlas Vector Search)")
+def get_jobs() -> IngestJobManager:
+    global _jobs
+    if _jobs is None:
+        store, embedder = get_store(), get_embedder()
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = IngestJobManager(store, embedder, on_change=_on_index_change)
+    return _jobs
+
+
+async def _warm_up() -> None:
+    # 서로 독립적인 준비 작업을 동시에: 저장소 로드/연결, 임베더(캐시 파일), OpenAI TLS, 토크나이저, lexical 인덱스
+    _warmup.update(running=True, errors={})
+
+    async def step(name: str, fn, required: bool = True) -> None:
+        t0 = time.perf_counter()
+        try:
+            await fn()
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)[:180]
+            _warmup["errors"][name] = {"detail": detail, "required": required}
+        finally:
+            _warmup["timings"][name] = round((time.perf_counter() - t0) * 1000, 1)
+            record_stage(f"warmup_{name}", time.perf_counter() - t0)
+
+    async def store_step() -> None:
+        store = await asyncio.to_thread(get_store)  # local: 파일/IVF 인덱스 로드
+        await store.acount()  # mongo: DNS/SRV 조회 + 커넥션 풀
+        if LEXICAL_INDEX:
+            await lexical.refresh(store.all_docs)
+
+    async def embedder_step() -> None:
+        await asyncio.to_thread(get_embedder)
+
+    async def llm_step() -> None:
+        # 가벼운 GET 한 번으로 TLS 핸드셰이크를 미리 (실패해도 요청 시 다시 연결하므로 필수 아님)
+        if llm_available():
+            await clients.openai_client().models.retrieve(OPENAI_CHAT_MODEL)
+
+    async def tokenizer_step() -> None:
+        await asyncio.to_thread(count_tokens, "warm-up")
+
+    try:
+        await asyncio.gather(
+            step("store", store_step),
+            step("embedder", embedder_step),
+            step("llm", llm_step, required=False),
+            step("tokenizer", tokenizer_step, required=False),
+        )
+        if not any(e["required"] for e in _warmup["errors"].values()):
+            get_jobs()
+            _warmup["ready"] = True
+    finally:
+        _warmup["running"] = False
+
+
+def _start_warm_up() -> None:
+    global _warmup_task
+    if _warmup["ready"] or _warmup["running"]:
+        return
+    _warmup_task = asyncio.create_task(_warm_up())
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # warm-up은 백그라운드로: 바로 요청을 받되(/health), 준비가 끝나야 /ready 가 200
+    _start_warm_up()
+    yield
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    await clients.aclose()
+    if _store is not None:
+        await _store.aclose()
+
+
+app = FastAPI(title="Swagger Threshold Chatbot (Mongo Atlas Vector Search)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,104 +168,498 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-store = MongoVectorStore()
-embedder = Embedder()
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    # 요청마다 단계 시간을 모아 Server-Timing 헤더로 (스트리밍 응답은 헤더 전송 시점까지)
+    timings, token = begin_request()
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
+    total = time.perf_counter() - t0
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_seconds",
+        total,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    response.headers["Server-Timing"] = server_timing(timings, total)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_DISTANCE)
+lexical = LexicalIndex()
+# 같은 질문 동시 요청은 한 번만 계산, 단계별(임베딩/검색/LLM) 동시 실행 수 제한 + 대기열이 차면 429
+chat_flight = SingleFlight()
+limits = {
+    "embed": Limiter("embed", CHAT_EMBED_CONCURRENCY, CHAT_QUEUE_MAX),
+    "search": Limiter("search", CHAT_SEARCH_CONCURRENCY, CHAT_QUEUE_MAX),
+    "llm": Limiter("llm", CHAT_LLM_CONCURRENCY, CHAT_QUEUE_MAX),
+}
+
+
+def _on_index_change() -> None:
+    answer_cache.invalidate()
+    lexical.mark_dirty()
 
 
 @app.get("/health")
 def health() -> Dict[str, Any]:
+    # liveness: 프로세스가 살아 있으면 항상 200 (아직 만들지 않은 저장소/임베더는 건드리지 않음)
     return {
         "status": "ok",
-        "docs": store.count(),
+        "ready": _warmup["ready"],
+        "docs": _store.count() if _store is not None else None,
+        "embed_backend": _embedder.backend if _embedder is not None else EMBED_BACKEND,
+        "embed_model": _embedder.model if _embedder is not None else None,
+        "embed_dim": _embedder.dim if _embedder is not None else None,
+        "llm": llm_available(),
         "default_top_k": DEFAULT_TOP_K,
         "default_threshold": DEFAULT_THRESHOLD,
+        "admission": {
+            **{name: lim.info() for name, lim in limits.items()},
+            "coalescing": len(chat_flight),
+            "ingest_pending": _jobs.pending() if _jobs is not None else 0,
+        },
     }
 
 
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    # readiness: warm-up이 끝나야 200. 필수 단계가 실패했으면 다시 시도하고 503
+    if not _warmup["ready"]:
+        _start_warm_up()
+    body = {k: _warmup[k] for k in ("ready", "running", "errors", "timings")}
+    return JSONResponse(body, status_code=200 if _warmup["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/namespaces")
+def list_namespaces() -> Dict[str, Any]:
+    return {"namespaces": get_store().namespaces()}
+
+
 @app.post("/reset")
-def reset() -> Dict[str, Any]:
-    deleted = store.reset()
-    return {"status": "reset_ok", "deleted": deleted}
+async def reset(namespace: Optional[str] = None) -> Dict[str, Any]:
+    # namespace를 주면 그 스펙만, 없으면 전체 삭제 (진행 중인 ingest/import가 끝난 뒤에)
+    store, jobs = get_store(), get_jobs()
+    async with jobs.writing():
+        deleted = await asyncio.to_thread(store.reset, namespace)
+    _on_index_change()
+    jobs.forget_fetched(namespace)
+    return {"status": "reset_ok", "namespace": namespace, "deleted": deleted}
+
+
+@app.get("/export")
+async def export_index(namespace: Optional[List[str]] = Query(None)) -> FileResponse:
+    # 임베딩까지 끝난 문서를 번들(tar)로. 다른 환경에서 /import 하면 재임베딩 없이 바로 검색 가능
+    store, model = get_store(), get_embedder().model
+    fd, path = tempfile.mkstemp(prefix="bundle-", suffix=".tar")
+    os.close(fd)
+    try:
+        with stage("export"):
+            await asyncio.to_thread(write_bundle, store, path, model, namespace)
+    except BaseException:
+        os.remove(path)
+        raise
+    name = "-".join(namespace) if namespace else "all"
+    return FileResponse(
+        path,
+        media_type="application/x-tar",
+        filename=f"swagger-index-{name}.tar",
+        background=BackgroundTask(os.remove, path),
+    )
+
+
+@app.post("/import")
+async def import_index(request: Request, namespace: Optional[List[str]] = Query(None)) -> Dict[str, Any]:
+    # 요청 본문 = /export 로 받은 tar. 번들의 namespace들은 번들 내용과 같아짐 (바뀐 문서만 upsert, 없는 문서 삭제)
+    embedder = get_embedder()
+    work = tempfile.mkdtemp(prefix="bundle-import-")
+    try:
+        path = os.path.join(work, "bundle.tar")
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+        src = os.path.join(work, "bundle")
+        os.makedirs(src)
+        with stage("import"):
+            await asyncio.to_thread(extract_bundle, path, src)
+            os.remove(path)
+            async with get_jobs().writing():
+                counts = await asyncio.to_thread(load_bundle, get_store(), src, embedder.model, embedder.dim, namespace)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    _on_index_change()
+    for ns in counts:
+        get_jobs().forget_fetched(ns)
+    return {"status": "import_ok", "embed_model": embedder.model, "namespaces": counts}
 
 
 @app.post("/ingest/openapi", response_model=IngestResponse)
 async def ingest_openapi(req: IngestRequest) -> IngestResponse:
-    spec_url = await resolve_spec_url(req.url, req.headers)
-    spec = await fetch_json(spec_url, req.headers)
-
-    docs: List[Doc] = make_docs_from_openapi(
-        spec=spec,
-        include_operations=req.include_operations,
-        include_schemas=req.include_schemas,
-        max_text_chars=req.max_text_chars,
-    )
-    if not docs:
-        raise HTTPException(400, "문서화할 operation/schema가 없습니다.")
+    # 동기 버전: job 파이프라인을 요청 안에서 끝까지 실행
+    job = get_jobs().create(req)
+    await get_jobs().run(job)
+    if job.status != "done":
+        raise HTTPException(job.error_status, job.error)
+    return job.result
 
-    vecs = embedder.embed([d.text for d in docs])
 
-    # upsert용 dict로 변환
-    rows = [
-        {
-            "doc_id": d.doc_id,
-            "kind": d.kind,
-            "title": d.title,
-            "text": d.text,
-            "metadata": d.metadata,
-        }
-        for d in docs
-    ]
-    store.reset()
-    store.upsert_docs(rows, vecs)
+@app.post("/ingest/jobs", response_model=IngestJobStatus, status_code=202)
+async def create_ingest_job(req: IngestRequest) -> IngestJobStatus:
+    job = get_jobs().create(req)
+    get_jobs().start(job)
+    return IngestJobStatus(**job.snapshot())
 
-    return IngestResponse(resolved_spec_url=spec_url, docs=len(docs), dim=int(vecs.shape[1]))
 
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobStatus)
+async def get_ingest_job(job_id: str) -> IngestJobStatus:
+    return IngestJobStatus(**get_jobs().get(job_id).snapshot())
 
-@app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest) -> ChatResponse:
-    if store.count() == 0:
+
+@app.post("/ingest/jobs/{job_id}/retry", response_model=IngestJobStatus, status_code=202)
+async def retry_ingest_job(job_id: str) -> IngestJobStatus:
+    job = get_jobs().retry(job_id)
+    return IngestJobStatus(**job.snapshot())
+
+
+@app.get("/ingest/jobs/{job_id}/events")
+async def ingest_job_events(job_id: str) -> StreamingResponse:
+    # 진행상황 SSE: progress(단계별 count + 새 로그) 반복, 끝나면 done/failed
+    job = get_jobs().get(job_id)
+
+    async def events() -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            version = job.version
+            snap = job.snapshot(log_from=sent)
+            sent += len(snap["log"])
+            if job.status in ("done", "failed"):
+                yield _sse(job.status, snap)
+                return
+            yield _sse("progress", snap)
+            await job.wait_change(version, timeout=15.0)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# (질문 벡터 | None, 검색 결과, 최고 점수, retrieval 종류)
+Retrieved = Tuple[Any, List[Tuple[Dict[str, Any], float]], float, str]
+
+
+async def _retrieve_many(queries: List[str], top_k: int, namespaces: Optional[List[str]]) -> List[Retrieved]:
+    # 질문 여러 개를 임베딩 1회 + 검색 1회(로컬은 행렬곱 한 번)로
+    with stage("count"):
+        n = await get_store().acount(namespaces)
+    if n == 0:
+        if namespaces:
+            raise HTTPException(400, f"인덱싱된 문서가 없는 namespace입니다. (namespace={', '.join(namespaces)})")
         raise HTTPException(400, "먼저 /ingest/openapi 로 스펙을 인덱싱하세요.")
 
-    qv = embedder.embed([req.query])
-    results: List[Tuple[Dict[str, Any], float]] = store.search(qv, req.top_k)
+    out: List[Optional[Retrieved]] = [None] * len(queries)
+    if LEXICAL_INDEX:
+        with stage("lexical"):
+            await lexical.refresh(get_store().all_docs)
+            # 질문에 경로/operationId가 그대로 있으면 임베딩 API 호출 없이 그 문서로 (점수 1.0)
+            for i, q in enumerate(queries):
+                exact = lexical.exact(q, namespaces)
+                if exact:
+                    out[i] = (None, [(d, 1.0) for d in exact[: max(1, top_k)]], 1.0, "lexical")
 
-    top_score = results[0][1] if results else 0.0
+    todo = [i for i, r in enumerate(out) if r is None]
+    if todo:
+        async with limits["embed"].slot():
+            with stage("embed"):
+                qvs = await get_embedder().aembed([queries[i] for i in todo])
+        async with limits["search"].slot():
+            with stage("search"):
+                found = await get_store().asearch_many(qvs, top_k, namespaces)
+        for i, qv, results in zip(todo, qvs, found):
+            retrieval = "vector"
+            if LEXICAL_INDEX:
+                with stage("bm25"):
+                    lex = lexical.bm25(queries[i], top_k, namespaces)
+                if lex:
+                    results = fuse(results, [d for d, _ in lex], top_k)
+                    retrieval = "hybrid"
+            # 융합 후 순서가 바뀔 수 있어 최대 코사인 값으로 게이트
+            top_score = max((s for _, s in results), default=0.0)
+            out[i] = (qv, results, top_score, retrieval)
+    return [r for r in out if r is not None]
 
-    # 내부 threshold 기준으로 자동 게이트
-    should_call_llm = top_score >= DEFAULT_THRESHOLD
 
-    if not should_call_llm:
-        answer, cits = make_fallback(results)
-        return ChatResponse(
-            query=req.query,
-            used_llm=False,
-            threshold=DEFAULT_THRESHOLD,
-            top_score=top_score,
-            answer=answer,
-            citations=cits,
-        )
+async def _retrieve(req: ChatRequest) -> Retrieved:
+    return (await _retrieve_many([req.query], req.top_k, req.namespaces()))[0]
 
-    context = build_context(results)
-    answer = call_chat(req.query, context)
 
-    cits = []
-    for doc, score in results[:3]:
-        meta = doc.get("metadata", {}) or {}
-        cits.append(
-            {
-                "doc_id": doc.get("doc_id"),
-                "title": doc.get("title"),
-                "score": score,
-                "method": meta.get("method"),
-                "path": meta.get("path"),
-            }
-        )
+def _cache_get(qv: Any, doc_ids: Tuple[str, ...], req: ChatRequest) -> Optional[ChatResponse]:
+    hit = answer_cache.get(qv, doc_ids, req.query)
+    if answer_cache.enabled:
+        metrics.inc("cache_total", cache="answer", result="hit" if hit is not None else "miss")
+    return hit
+
+
+def _count_chat(resp: ChatResponse) -> ChatResponse:
+    metrics.inc(
+        "chat_total",
+        retrieval=resp.retrieval,
+        used_llm=str(resp.used_llm).lower(),
+        cached=str(resp.cached).lower(),
+        precomputed=str(resp.precomputed).lower(),
+    )
+    return resp
 
+
+async def _build_context(query: str, results: List[Tuple[Dict[str, Any], float]]) -> Tuple[str, int]:
+    # 반환: (context, LLM에 보낼 프롬프트 전체 토큰 수)
+    with stage("hydrate"):
+        results = await get_store().ahydrate(results)
+    with stage("context"):
+        context, _ = build_context(results)
+        n = prompt_tokens(query, context)
+    metrics.observe("prompt_tokens", n)
+    return context, n
+
+
+def _from_cache(hit: ChatResponse, req: ChatRequest, top_score: float, retrieval: str) -> ChatResponse:
+    return hit.model_copy(update={"query": req.query, "top_score": top_score, "cached": True, "retrieval": retrieval})
+
+
+def _fallback_response(
+    req: ChatRequest, results: List[Tuple[Dict[str, Any], float]], top_score: float, retrieval: str
+) -> ChatResponse:
+    answer, cits = make_fallback(results)
     return ChatResponse(
         query=req.query,
-        used_llm=True,
+        used_llm=False,
         threshold=DEFAULT_THRESHOLD,
         top_score=top_score,
         answer=answer,
         citations=cits,
+        retrieval=retrieval,
+    )
+
+
+async def _precomputed(
+    req: ChatRequest, results: List[Tuple[Dict[str, Any], float]], top_score: float, retrieval: str
+) -> Optional[ChatResponse]:
+    # operation 하나가 뚜렷하게 1등이고 그 문서의 미리 만든 답변이 최신이면 LLM 없이 그대로
+    doc = dominant_operation(results, DEFAULT_THRESHOLD, PRECOMPUTED_MARGIN)
+    if doc is None or doc.get("answer_hash") != answer_key(doc):
+        return None
+    with stage("precomputed"):
+        answer = await get_store().aget_answer(doc)
+    if not answer:
+        return None
+    return ChatResponse(
+        query=req.query,
+        used_llm=True,
+        threshold=DEFAULT_THRESHOLD,
+        top_score=top_score,
+        answer=answer,
+        citations=make_citations(results),
+        retrieval=retrieval,
+        precomputed=True,
+    )
+
+
+def _doc_keys(results: List[Tuple[Dict[str, Any], float]]) -> Tuple[str, ...]:
+    # namespace가 다르면 doc_id가 같아도 다른 문서
+    return tuple(f"{doc.get('namespace')}/{doc.get('doc_id')}" for doc, _ in results)
+
+
+async def _answer(
+    req: ChatRequest, retrieved: Retrieved, llm_slot: Optional[asyncio.Semaphore] = None
+) -> ChatResponse:
+    qv, results, top_score, retrieval = retrieved
+
+    # ingest 때 만든 답변은 LLM 키가 없는 배포(번들 import)에서도 사용
+    pre = await _precomputed(req, results, top_score, retrieval)
+    if pre is not None:
+        return _count_chat(pre)
+
+    # 내부 threshold 기준으로 자동 게이트 (LLM을 못 쓰는 배포면 항상 fallback)
+    should_call_llm = top_score >= DEFAULT_THRESHOLD and llm_available()
+
+    if not should_call_llm:
+        return _count_chat(_fallback_response(req, results, top_score, retrieval))
+
+    # 비슷한 질문 + 같은 근거 문서 집합이면 LLM 호출 없이 이전 답변 재사용
+    doc_ids = _doc_keys(results)
+    hit = _cache_get(qv, doc_ids, req)
+    if hit is not None:
+        return _count_chat(_from_cache(hit, req, top_score, retrieval))
+
+    async with llm_slot or nullcontext(), limits["llm"].slot():
+        context, n_prompt = await _build_context(req.query, results)
+        with stage("llm"):
+            answer = await call_chat(req.query, context)
+
+    resp = ChatResponse(
+        query=req.query,
+        used_llm=True,
+        threshold=DEFAULT_THRESHOLD,
+        top_score=top_score,
+        answer=answer,
+        citations=make_citations(results),
+        retrieval=retrieval,
+        prompt_tokens=n_prompt,
+    )
+    answer_cache.put(qv, doc_ids, resp, req.query)
+    return _count_chat(resp)
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest) -> ChatResponse:
+    if not CHAT_COALESCE:
+        return await _answer(req, await _retrieve(req))
+
+    # 공백만 다른 같은 질문 + 같은 검색 옵션이 진행 중이면 그 결과를 같이 씀 (임베딩/검색/LLM 1회)
+    async def compute() -> ChatResponse:
+        return await _answer(req, await _retrieve(req))
+
+    key = (normalize_text(req.query), req.top_k, tuple(req.namespaces() or ()))
+    resp, shared = await chat_flight.do(key, compute)
+    if not shared:
+        return resp
+    metrics.inc("coalesced_total")
+    return resp.model_copy(update={"query": req.query}) if resp.query != req.query else resp
+
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(req: ChatBatchRequest) -> ChatBatchResponse:
+    # 임베딩/검색은 한 번에, threshold를 넘은 질문만 LLM을 CHAT_BATCH_CONCURRENCY개까지 동시에
+    # 같은 질문은 한 번만 처리하고, 결과는 입력 순서대로
+    unique = list(dict.fromkeys(req.queries))
+    retrieved = await _retrieve_many(unique, req.top_k, req.namespaces())
+    llm_slot = asyncio.Semaphore(max(1, CHAT_BATCH_CONCURRENCY))
+
+    async def one(query: str, r: Retrieved) -> ChatResponse:
+        item = req.item(query)
+        try:
+            return await _answer(item, r, llm_slot)
+        except Exception as e:
+            # 한 질문의 LLM 실패로 배치 전체를 버리지 않음
+            detail = e.detail if isinstance(e, HTTPException) else f"LLM 호출 실패. (error={str(e)[:180]})"
+            _, results, top_score, retrieval = r
+            return _fallback_response(item, results, top_score, retrieval).model_copy(update={"error": detail})
+
+    answers = await asyncio.gather(*(one(q, r) for q, r in zip(unique, retrieved)))
+    by_query = dict(zip(unique, answers))
+    return ChatBatchResponse(results=[by_query[q] for q in req.queries])
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest) -> StreamingResponse:
+    # 이벤트 순서: meta(근거/점수) -> token* -> done(usage/timings)
+    # threshold 미만 / 캐시 hit / 미리 만든 답변은 answer 한 프레임으로 끝
+    t0 = time.perf_counter()
+    qv, results, top_score, retrieval = await _retrieve(req)
+    pre = await _precomputed(req, results, top_score, retrieval)
+    t_retrieved = time.perf_counter()
+    if pre is None and top_score >= DEFAULT_THRESHOLD and llm_available():
+        # LLM 대기열이 이미 꽉 찼으면 스트림을 열기 전에 429
+        limits["llm"].check()
+
+    def ms(t: float) -> float:
+        return round((t - t0) * 1000, 1)
+
+    async def events() -> AsyncIterator[str]:
+        if pre is not None:
+            yield _sse("answer", _count_chat(pre).model_dump())
+            return
+        if top_score < DEFAULT_THRESHOLD or not llm_available():
+            yield _sse("answer", _count_chat(_fallback_response(req, results, top_score, retrieval)).model_dump())
+            return
+
+        doc_ids = _doc_keys(results)
+        hit = _cache_get(qv, doc_ids, req)
+        if hit is not None:
+            cached = _count_chat(_from_cache(hit, req, top_score, retrieval))
+            yield _sse("answer", cached.model_dump())
+            return
+
+        cits = make_citations(results)
+        yield _sse(
+            "meta",
+            {
+                "query": req.query,
+                "used_llm": True,
+                "threshold": DEFAULT_THRESHOLD,
+                "top_score": top_score,
+                "citations": cits,
+                "retrieval": retrieval,
+            },
+        )
+
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        t_first = None
+        try:
+            async with limits["llm"].slot():
+                context, n_prompt = await _build_context(req.query, results)
+                t_llm = time.perf_counter()
+                async for kind, value in stream_chat(req.query, context):
+                    if kind == "token":
+                        if t_first is None:
+                            t_first = time.perf_counter()
+                        parts.append(value)
+                        yield _sse("token", {"t": value})
+                    else:
+                        usage = value
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": f"LLM 스트리밍 실패. (error={str(e)[:180]})"})
+            return
+
+        t_end = time.perf_counter()
+        record_stage("llm", t_end - t_llm)
+        resp = ChatResponse(
+            query=req.query,
+            used_llm=True,
+            threshold=DEFAULT_THRESHOLD,
+            top_score=top_score,
+            answer="".join(parts).strip(),
+            citations=cits,
+            retrieval=retrieval,
+            prompt_tokens=n_prompt,
+        )
+        answer_cache.put(qv, doc_ids, _count_chat(resp), req.query)
+        yield _sse(
+            "done",
+            {
+                "usage": usage,
+                "prompt_tokens": n_prompt,
+                "timings": {
+                    "retrieve_ms": ms(t_retrieved),
+                    "first_token_ms": ms(t_first) if t_first is not None else None,
+                    "llm_ms": round((t_end - t_llm) * 1000, 1),
+                    "total_ms": ms(t_end),
+                },
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -1,14 +1,28 @@
-from pydantic import BaseModel
-from typing import Any, Dict, List
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Union
 import os
 
+from schemas.ingest import Namespace
+from core.config import CHAT_BATCH_MAX
+
 DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", "5"))
 DEFAULT_THRESHOLD = float(os.getenv("DEFAULT_THRESHOLD", "0.80"))
 
+def _namespace_list(value: Optional[Union[str, List[str]]]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    names = [value] if isinstance(value, str) else list(value)
+    return sorted(set(n for n in names if n)) or None
+
 class ChatRequest(BaseModel):
     query: str
     top_k: int = DEFAULT_TOP_K
-        
+    # 하나 또는 여러 개, 생략하면 전체 namespace에서 검색
+    namespace: Optional[Union[Namespace, List[Namespace]]] = Field(None, description="검색할 스펙 namespace (문자열 또는 리스트)")
+
+    def namespaces(self) -> Optional[List[str]]:
+        return _namespace_list(self.namespace)
+
 
 class ChatResponse(BaseModel):
     query: str
@@ -17,3 +31,24 @@ class ChatResponse(BaseModel):
     top_score: float
     answer: str
     citations: List[Dict[str, Any]]
+    cached: bool = False
+    precomputed: bool = False  # ingest 때 미리 만든 operation 답변 (요청 시 LLM 호출 없음)
+    retrieval: str = "vector"  # vector | hybrid(BM25 융합) | lexical(정확 매칭, 임베딩 생략)
+    prompt_tokens: Optional[int] = None  # LLM 호출 전에 센 프롬프트 토큰 수 (LLM을 안 썼으면 없음)
+    error: Optional[str] = None  # /chat/batch 에서 이 질문만 LLM 호출이 실패한 경우 (answer는 fallback)
+
+
+class ChatBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=CHAT_BATCH_MAX)
+    top_k: int = DEFAULT_TOP_K
+    namespace: Optional[Union[Namespace, List[Namespace]]] = Field(None, description="모든 질문에 공통으로 쓸 namespace")
+
+    def namespaces(self) -> Optional[List[str]]:
+        return _namespace_list(self.namespace)
+
+    def item(self, query: str) -> ChatRequest:
+        return ChatRequest(query=query, top_k=self.top_k, namespace=self.namespace)
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatResponse]  # 입력 순서 그대로
@@ -1,14 +1,42 @@
-from pydantic import BaseModel, Field
-from typing import Dict
+from pydantic import BaseModel, Field, StringConstraints
+from typing import Any, Dict, List, Optional
+from typing_extensions import Annotated
+
+from core.config import DEFAULT_NAMESPACE, PRECOMPUTE_ANSWERS
+
+Namespace = Annotated[str, StringConstraints(pattern=r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")]
 
 class IngestRequest(BaseModel):
     url: str = Field(..., description="OpenAPI 스펙 URL 또는 Swagger UI URL")
+    namespace: Namespace = Field(DEFAULT_NAMESPACE, description="스펙 구분 이름 (ingest/reset/검색 단위)")
+    version: Optional[str] = Field(None, description="없으면 스펙의 info.version")
     headers: Dict[str, str] = Field(default_factory=dict)
     include_operations: bool = True
     include_schemas: bool = True
     max_text_chars: int = 2000
+    incremental: bool = Field(True, description="False면 해시 비교 없이 전체 재임베딩")
+    precompute_answers: bool = Field(PRECOMPUTE_ANSWERS, description="operation 문서별 설명 답변을 LLM으로 미리 생성 (바뀐 문서만)")
 
 class IngestResponse(BaseModel):
     resolved_spec_url: str
+    namespace: str = DEFAULT_NAMESPACE
+    version: Optional[str] = None
     docs: int
     dim: int
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    answered: int = 0  # 새로 생성한 미리 만든 답변 수
+    not_modified: bool = False  # 304로 파싱/임베딩 없이 끝난 경우
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    attempts: int
+    counts: Dict[str, int]
+    timings: Dict[str, float] = Field(default_factory=dict)  # 단계별 누적 ms
+    checkpointed: int
+    log: List[Dict[str, Any]]
+    error: Optional[str] = None
+    result: Optional[IngestResponse] = None
@@ -0,0 +1,105 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+# IVF(int8 + 재정렬) 인덱스의 recall / 지연시간을 brute force와 비교
+#   python -m tools.ann_bench --rows 200000 --dim 256 --nprobe 1,4,16,64
+# 벡터는 군집이 있는 합성 데이터 (실제 임베딩처럼 주제별로 뭉쳐 있음), 질문은 문서 벡터에 잡음을 섞은 것
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.ann_index import IVFIndex  # noqa: E402
+from tools.bench import _stats  # noqa: E402
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return (m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+
+def make_vectors(rows: int, dim: int, topics: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    out = np.empty((rows, dim), dtype=np.float32)
+    for i in range(0, rows, 65536):
+        n = min(65536, rows - i)
+        pick = rng.integers(0, topics, n)
+        out[i : i + n] = _normalize(centers[pick] + noise * rng.standard_normal((n, dim)).astype(np.float32))
+    return out
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    vecs = make_vectors(args.rows, args.dim, args.topics, args.noise, rng)
+    base = vecs[rng.integers(0, args.rows, args.queries)]
+    queries = _normalize(base + args.query_noise * rng.standard_normal(base.shape).astype(np.float32))
+
+    t = time.perf_counter()
+    ann = IVFIndex.train(vecs, seed=args.seed)
+    train_s = time.perf_counter() - t
+
+    # 정답: 전체 내적
+    exact_ids: List[np.ndarray] = []
+    exact_t: List[float] = []
+    for q in queries:
+        t = time.perf_counter()
+        scores = vecs @ q
+        top = np.argpartition(-scores, args.k - 1)[: args.k]
+        exact_t.append(time.perf_counter() - t)
+        exact_ids.append(top)
+
+    sweep: List[Dict[str, Any]] = []
+    for nprobe in [int(x) for x in args.nprobe.split(",") if x]:
+        hits = 0
+        lat: List[float] = []
+        for q, truth in zip(queries, exact_ids):
+            t = time.perf_counter()
+            ((ids, _),) = ann.search(vecs, q[None, :], args.k, nprobe, args.rerank)
+            lat.append(time.perf_counter() - t)
+            hits += len(np.intersect1d(ids, truth))
+        sweep.append(
+            {
+                "nprobe": nprobe,
+                "rerank": args.rerank,
+                f"recall@{args.k}": round(hits / (len(queries) * args.k), 4),
+                **_stats(lat),
+            }
+        )
+
+    return {
+        "args": vars(args),
+        "index": {**ann.info(), "train_s": round(train_s, 2), "codes_mb": round(ann.codes.nbytes / 2**20, 1)},
+        "brute_force": {"vectors_mb": round(vecs.nbytes / 2**20, 1), **_stats(exact_t)},
+        "ivf": sweep,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="IVF 인덱스 recall / 지연시간 벤치마크")
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--topics", type=int, default=500, help="합성 벡터 군집 수")
+    ap.add_argument("--noise", type=float, default=0.6, help="군집 안 퍼짐 정도")
+    ap.add_argument("--query-noise", type=float, default=0.3)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="쉼표로 구분")
+    ap.add_argument("--rerank", type=int, default=4, help="k * rerank 개를 원본 벡터로 재정렬 (ANN_RERANK)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="결과 JSON 파일 (없으면 stdout)")
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+# 오프라인 벤치마크: OpenAI / Atlas 없이 합성 스펙 + 가짜 임베딩/챗 + local 저장소로 단계별 시간 측정
+#   python -m tools.bench --ops 2000 --depth 3 --fanout 3 --out bench.json
+# 결과 JSON을 커밋끼리 비교 (같은 --seed 면 같은 스펙/질문)
+
+_WORDS = (
+    "user order invoice payment product cart coupon review shipment address role team project "
+    "token session report audit webhook file image tag category price stock refund"
+).split()
+
+
+def make_spec(ops: int, schemas: int, depth: int, fanout: int, seed: int = 0) -> Dict[str, Any]:
+    # depth: schema가 $ref로 몇 단계까지 중첩되는지 / fanout: schema 하나가 참조하는 다른 schema 수
+    rnd = random.Random(seed)
+    names = [f"{rnd.choice(_WORDS).title()}{i}" for i in range(max(1, schemas))]
+
+    comp: Dict[str, Any] = {}
+    for i, name in enumerate(names):
+        props: Dict[str, Any] = {
+            "id": {"type": "string", "description": f"{name} id"},
+            "createdAt": {"type": "string", "format": "date-time"},
+            "status": {"type": "string", "enum": ["active", "inactive", "deleted"]},
+        }
+        level = i % max(1, depth + 1)
+        if level < depth:
+            for j in range(fanout):
+                target = names[(i + j + 1) % len(names)]
+                if j % 2:
+                    props[f"items{j}"] = {"type": "array", "items": {"$ref": f"#/components/schemas/{target}"}}
+                else:
+                    props[f"ref{j}"] = {"$ref": f"#/components/schemas/{target}"}
+        comp[name] = {"type": "object", "description": f"{name} 리소스", "required": ["id"], "properties": props}
+
+    paths: Dict[str, Any] = {}
+    made = 0
+    i = 0
+    while made < ops:
+        res = rnd.choice(_WORDS)
+        base = f"/v{1 + i % 3}/{res}s{i}"
+        item_path = base + "/{id}"
+        for path, methods in ((base, ["get", "post"]), (item_path, ["get", "put", "patch", "delete"])):
+            for m in methods:
+                if made >= ops:
+                    break
+                schema = names[rnd.randrange(len(names))]
+                op: Dict[str, Any] = {
+                    "operationId": f"{m}{res.title()}{i}{'Item' if path == item_path else ''}",
+                    "summary": f"{m.upper()} {res} {i}",
+                    "description": f"{res} 리소스를 {m} 합니다. " + " ".join(rnd.choices(_WORDS, k=12)),
+                    "tags": [res],
+                    "parameters": [
+                        {"name": "limit", "in": "query", "schema": {"type": "integer"}},
+                        {"name": "X-Trace-Id", "in": "header", "schema": {"type": "string"}},
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "ok",
+                            "content": {"application/json": {"schema": {"$ref": f"#/components/schemas/{schema}"}}},
+                        },
+                        "404": {"description": "not found"},
+                    },
+                }
+                if path == item_path:
+                    op["parameters"].append({"name": "id", "in": "path", "required": True, "schema": {"type": "string"}})
+                if m in ("post", "put", "patch"):
+                    op["requestBody"] = {
+                        "content": {"application/json": {"schema": {"$ref": f"#/components/schemas/{schema}"}}}
+                    }
+                paths.setdefault(path, {})[m] = op
+                made += 1
+        i += 1
+
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "bench", "version": f"{ops}.{schemas}.{depth}.{fanout}"},
+        "paths": paths,
+        "components": {"schemas": comp},
+    }
+
+
+def _stats(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "mean_ms": round(statistics.fmean(s) * 1000, 3),
+        "p50_ms": round(s[len(s) // 2] * 1000, 3),
+        "p95_ms": round(s[min(len(s) - 1, int(len(s) * 0.95))] * 1000, 3),
+        "max_ms": round(s[-1] * 1000, 3),
+    }
+
+
+def _timed(fn: Callable[[], Any]) -> tuple:
+    t = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t
+
+
+# --- 가짜 OpenAI 클라이언트 (core.clients 싱글턴 자리에 꽂음) ---
+class FakeOpenAI:
+    def __init__(self, dim: int, embed_latency: float, chat_latency: float, chat_tokens: int) -> None:
+        from tools.fake_openai import hash_vector
+
+        self.dim = dim
+        self.embed_latency = embed_latency
+        self.chat_latency = chat_latency
+        self.chat_tokens = chat_tokens
+        self.calls = {"embeddings": 0, "embedded_inputs": 0, "chat": 0}
+        self._hash_vector = hash_vector
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    def with_options(self, **_: Any) -> "FakeOpenAI":
+        return self
+
+    async def close(self) -> None:
+        return None
+
+    async def _embed(self, model: str, input: List[str], **_: Any) -> Any:
+        self.calls["embeddings"] += 1
+        self.calls["embedded_inputs"] += len(input)
+        if self.embed_latency:
+            await asyncio.sleep(self.embed_latency)
+        data = [SimpleNamespace(index=i, embedding=self._hash_vector(t, self.dim)) for i, t in enumerate(input)]
+        return SimpleNamespace(data=data)
+
+    async def _chat(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **_: Any) -> Any:
+        self.calls["chat"] += 1
+        words = ["답변"] * self.chat_tokens
+        usage = SimpleNamespace(model_dump=lambda: {"prompt_tokens": 0, "completion_tokens": len(words)})
+        if not stream:
+            await asyncio.sleep(self.chat_latency)
+            msg = SimpleNamespace(content=" ".join(words))
+            return SimpleNamespace(choices=[SimpleNamespace(message=msg)], usage=usage)
+
+        async def gen():
+            # 첫 토큰까지 latency의 절반, 나머지는 토큰마다 나눠서
+            await asyncio.sleep(self.chat_latency / 2)
+            per = self.chat_latency / 2 / max(1, len(words))
+            for w in words:
+                await asyncio.sleep(per)
+                yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=w + " "))])
+            yield SimpleNamespace(usage=usage, choices=[])
+
+        return gen()
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    store_dir = tempfile.mkdtemp(prefix="bench-store-")
+    # 설정은 import 시점에 읽히므로 먼저 환경변수부터
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "bench",
+            "VECTOR_STORE": "local",
+            "LOCAL_STORE_DIR": store_dir,
+            "EMBED_CACHE_PATH": "",
+            "ANSWER_CACHE_SIZE": str(args.answer_cache),
+            "DEFAULT_THRESHOLD": str(args.threshold),
+            "LEXICAL_INDEX": "1" if args.lexical else "0",
+            "EMBED_BACKEND": args.embed_backend,
+            "LOCAL_EMBED_DIM": str(args.dim),
+        }
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from core import clients
+    from core.ingest import doc_to_row
+    from core.embedder import Embedder, make_batches
+    from core.config import EMBED_BATCH_MAX_ITEMS, EMBED_BATCH_MAX_TOKENS, INGEST_BATCH_SIZE
+    from core.openapi_parse import make_docs_from_openapi
+    from db.local_store import LocalVectorStore
+
+    fake = FakeOpenAI(args.dim, args.embed_latency_ms / 1000, args.chat_latency_ms / 1000, args.chat_tokens)
+    clients._openai = fake
+
+    result: Dict[str, Any] = {}
+    try:
+        spec, t = _timed(lambda: make_spec(args.ops, args.schemas, args.depth, args.fanout, args.seed))
+        spec_bytes = len(json.dumps(spec))
+        result["spec"] = {"ops": args.ops, "schemas": args.schemas, "bytes": spec_bytes, "gen_ms": round(t * 1000, 1)}
+
+        # 1) 문서 생성
+        docs, t = _timed(lambda: make_docs_from_openapi(spec, True, True, 2000, workers=args.workers))
+        result["parse"] = {"docs": len(docs), "ms": round(t * 1000, 1), "docs_per_s": round(len(docs) / t, 1)}
+
+        # 2) 임베딩 (배치 분할 + 동시 호출 경로 그대로, API만 가짜)
+        embedder = Embedder()
+        texts = [d.text for d in docs]
+        batches = make_batches(texts, EMBED_BATCH_MAX_ITEMS, EMBED_BATCH_MAX_TOKENS)
+        vecs, t = _timed(lambda: asyncio.run(embedder.aembed(texts)))
+        result["embed"] = {
+            "inputs": len(texts),
+            "batches": len(batches),
+            "ms": round(t * 1000, 1),
+            "inputs_per_s": round(len(texts) / t, 1),
+        }
+
+        # 3) upsert (ingest 파이프라인과 같은 배치 크기)
+        store = LocalVectorStore(os.path.join(store_dir, "direct"))
+        rows = [doc_to_row(d, embedder.model, "bench") for d in docs]
+        samples: List[float] = []
+        for i in range(0, len(rows), INGEST_BATCH_SIZE):
+            _, t = _timed(lambda: store.upsert_docs(rows[i : i + INGEST_BATCH_SIZE], vecs[i : i + INGEST_BATCH_SIZE]))
+            samples.append(t)
+        result["upsert"] = {"rows": len(rows), "batch": INGEST_BATCH_SIZE, "total_ms": round(sum(samples) * 1000, 1), **_stats(samples)}
+
+        # 4) 검색
+        rng = random.Random(args.seed)
+        qidx = [rng.randrange(len(docs)) for _ in range(args.queries)]
+        samples = []
+        for i in qidx:
+            _, t = _timed(lambda: store.search(vecs[i : i + 1], args.top_k))
+            samples.append(t)
+        result["search"] = {"docs": store.count(), "top_k": args.top_k, **_stats(samples)}
+
+        # 5) /chat 엔드투엔드 (FastAPI 앱, ingest도 앱을 통해서)
+        result["chat"] = _bench_app(args, spec, docs, qidx)
+        result["fake_calls"] = dict(fake.calls)
+    finally:
+        clients._openai = None
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": result,
+    }
+
+
+def _bench_app(args: argparse.Namespace, spec: Dict[str, Any], docs: List[Any], qidx: List[int]) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    import core.jobs
+    import main
+    from core.openapi_stream import SpecSource
+
+    async def resolve(url: str, headers: Dict[str, str]) -> str:
+        return url
+
+    async def download(url: str, headers: Dict[str, str], validators: Any = None) -> SpecSource:
+        fd, path = tempfile.mkstemp(prefix="bench-spec-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        return SpecSource(path, "json")
+
+    core.jobs.resolve_spec_url = resolve
+    core.jobs.download_spec = download
+
+    # 절반은 자연어(요약), 절반은 "METHOD /path" 로 질문 (lexical fast path 비율 확인용)
+    queries: List[str] = []
+    for n, i in enumerate(qidx):
+        d = docs[i]
+        if n % 2 and d.kind == "operation":
+            queries.append(f"{d.metadata['method']} {d.metadata['path']} 는 뭘 반환해?")
+        else:
+            summary = next((l[9:] for l in d.text.splitlines() if l.startswith("summary: ")), d.title)
+            queries.append(summary.lower() + " 어떻게 써?")
+
+    out: Dict[str, Any] = {}
+    with TestClient(main.app) as c:
+        t = time.perf_counter()
+        r = c.post("/ingest/openapi", json={"url": "http://bench/openapi.json", "namespace": "bench"})
+        r.raise_for_status()
+        out["ingest"] = {"ms": round((time.perf_counter() - t) * 1000, 1), **r.json()}
+
+        for endpoint in ("/chat", "/chat/stream"):
+            samples: List[float] = []
+            kinds: Dict[str, int] = {}
+            for q in queries:
+                t = time.perf_counter()
+                r = c.post(endpoint, json={"query": q, "top_k": args.top_k})
+                r.raise_for_status()
+                samples.append(time.perf_counter() - t)
+                if endpoint == "/chat":
+                    body = r.json()
+                    key = f"{body.get('retrieval')}/{'llm' if body['used_llm'] else 'fallback'}"
+                    kinds[key] = kinds.get(key, 0) + 1
+            out[endpoint] = {**_stats(samples), **({"paths": kinds} if kinds else {})}
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="오프라인 벤치마크 (OpenAI/Atlas 불필요)")
+    ap.add_argument("--ops", type=int, default=1000, help="operation 수")
+    ap.add_argument("--schemas", type=int, default=200, help="components.schemas 수")
+    ap.add_argument("--depth", type=int, default=3, help="schema $ref 중첩 깊이")
+    ap.add_argument("--fanout", type=int, default=3, help="schema 하나당 $ref 수")
+    ap.add_argument("--workers", type=int, default=0, help="문서 생성 프로세스 수 (PARSE_WORKERS)")
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--embed-backend", choices=("openai", "local"), default="openai", help="openai = 가짜 API, local = CPU 해싱 임베딩")
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--embed-latency-ms", type=float, default=0.0, help="가짜 임베딩 API 호출당 지연")
+    ap.add_argument("--chat-latency-ms", type=float, default=50.0, help="가짜 챗 모델 응답 지연")
+    ap.add_argument("--chat-tokens", type=int, default=40)
+    ap.add_argument("--threshold", type=float, default=-1.0, help="기본 -1: 모든 질문이 LLM 경로를 타도록")
+    ap.add_argument("--answer-cache", type=int, default=0, help="ANSWER_CACHE_SIZE (기본 0 = 끔)")
+    ap.add_argument("--no-lexical", dest="lexical", action="store_false")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="결과 JSON 파일 (없으면 stdout)")
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# 인덱스 번들 CLI (서버 없이 현재 환경변수의 저장소에 바로)
+#   python -m tools.bundle export prod.tar --namespace petstore
+#   python -m tools.bundle import prod.tar
+# 서버가 떠 있으면 GET /export, POST /import 를 써도 같음
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="인덱스 번들 export / import (재임베딩 없이 환경 간 이동)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="저장소 -> 번들 tar")
+    ex.add_argument("path")
+    ex.add_argument("--namespace", action="append", help="여러 번 지정 가능 (없으면 전체)")
+    im = sub.add_parser("import", help="번들 tar -> 저장소")
+    im.add_argument("path")
+    im.add_argument("--namespace", action="append", help="번들 중 이 namespace만 (없으면 전체)")
+    args = ap.parse_args()
+
+    from fastapi import HTTPException
+
+    from core.bundle import extract_bundle, load_bundle, write_bundle
+    from main import get_embedder, get_store
+
+    try:
+        embedder = get_embedder()
+        if args.cmd == "export":
+            meta = write_bundle(get_store(), args.path, embedder.model, args.namespace)
+            out = {"path": args.path, "bytes": os.path.getsize(args.path), **meta}
+        else:
+            work = tempfile.mkdtemp(prefix="bundle-import-")
+            try:
+                extract_bundle(args.path, work)
+                out = {"namespaces": load_bundle(get_store(), work, embedder.model, embedder.dim, args.namespace)}
+            finally:
+                shutil.rmtree(work, ignore_errors=True)
+    except HTTPException as e:
+        print(f"error: {e.detail}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
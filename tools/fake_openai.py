@@ -0,0 +1,63 @@
+from __future__ import annotations
+import hashlib
+import os
+import random
+from typing import Any, Dict, List, Union
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# 로컬 개발/검증용 가짜 OpenAI embeddings 서버
+#   uvicorn tools.fake_openai:app --port 8090
+#   OPENAI_BASE_URL=http://localhost:8090/v1
+# FAKE_FAIL_RATE(0~1) 비율로 429/503을 섞어서 재시도 로직을 확인할 수 있음
+
+FAKE_DIM = int(os.getenv("FAKE_DIM", "1536"))
+FAKE_FAIL_RATE = float(os.getenv("FAKE_FAIL_RATE", "0"))
+FAKE_MAX_INPUTS = int(os.getenv("FAKE_MAX_INPUTS", "2048"))
+
+app = FastAPI(title="Fake OpenAI")
+stats: Dict[str, int] = {"requests": 0, "inputs": 0, "failed": 0}
+
+
+def hash_vector(text: str, dim: int = FAKE_DIM) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+class EmbeddingsRequest(BaseModel):
+    model: str
+    input: Union[str, List[str]]
+    encoding_format: str = "float"
+
+
+@app.post("/v1/embeddings")
+def embeddings(req: EmbeddingsRequest) -> Any:
+    stats["requests"] += 1
+    texts = [req.input] if isinstance(req.input, str) else req.input
+
+    if FAKE_FAIL_RATE and random.random() < FAKE_FAIL_RATE:
+        stats["failed"] += 1
+        status = random.choice([429, 503])
+        return JSONResponse({"error": {"message": "fake failure", "type": "fake"}}, status_code=status)
+    if len(texts) > FAKE_MAX_INPUTS:
+        return JSONResponse({"error": {"message": "too many inputs", "type": "invalid_request_error"}}, status_code=400)
+
+    stats["inputs"] += len(texts)
+    return {
+        "object": "list",
+        "model": req.model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": hash_vector(t).tolist()}
+            for i, t in enumerate(texts)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.get("/stats")
+def get_stats() -> Dict[str, int]:
+    return stats